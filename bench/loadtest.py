@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+"""부하 테스트 / 벤치마크
+
+MODEL_BACKEND=fake로 gunicorn을 임시 작업 폴더에서 띄운 뒤(지문 json 폴더만 연결), 설문조사와 요약기
+라우트를 섞은 트래픽을 보내고 라우트별 처리량과 p50/p95/p99 지연 시간을 출력한다.
+결과를 기준선 JSON으로 저장해 두었다가 다음 릴리스에서 --compare로 비교하면, 지연 시간이나 처리량이
+--threshold 이상 나빠진 라우트를 보고하고 종료 코드 1로 끝난다.
+
+가상 사용자(클라이언트)는 각자 설문 진행 상황(progress)과 쿠키를 유지한다.
+- page: /page에서 지문을 받고, post: 받은 지문에 답을 제출한 뒤 다음 페이지로 넘어간다.
+- summarize / core-summary: 저장된 지문을 요약한다. --unique-ratio 비율만큼은 글 끝에 임의 문장을 붙여 캐시를 피한다.
+- sample-text, feedback, star-feedback
+
+사용법:
+    python bench/loadtest.py --duration 30 --clients 32
+    python bench/loadtest.py --save-baseline bench/baselines/release.json
+    python bench/loadtest.py --compare bench/baselines/release.json --threshold 0.2
+    python bench/loadtest.py --serve-mode async --workers 2 --fake-latency-ms 800
+    python bench/loadtest.py --url http://127.0.0.1:8000   # 이미 떠 있는 서버에 보냄 (서버 설정은 직접)
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSAGE_FOLDER = os.path.join(REPO_DIR, 'json')
+
+DEFAULT_MIX = {
+    'page': 30,
+    'post': 20,
+    'summarize': 15,
+    'core-summary': 10,
+    'sample-text': 10,
+    'feedback': 8,
+    'star-feedback': 7,
+}
+PERCENTILES = [50, 95, 99]
+
+_SLOT_RE = re.compile(r'name="slot" value="(\d+)"')
+_PROGRESS_RE = re.compile(r'name="progress" value="([^"]*)"')
+_TITLE_RE = re.compile(r'<title>([^<]*)</title>')
+
+
+def _parse_mix(value):
+    mix = {}
+    for item in value.split(','):
+        route, _, weight = item.partition('=')
+        if route not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"알 수 없는 라우트: {route} (가능한 값: {', '.join(DEFAULT_MIX)})")
+        mix[route] = float(weight)
+    return mix
+
+
+def _load_texts():
+    texts = []
+    for name in sorted(os.listdir(PASSAGE_FOLDER)):
+        if name.endswith('.json'):
+            with open(os.path.join(PASSAGE_FOLDER, name), 'r', encoding='UTF-8') as f:
+                text = json.load(f).get('text')
+            if text:
+                texts.append(str(text))
+    return texts
+
+
+def _percentile(sorted_values, p):
+    """최근접 순위(nearest-rank) 백분위수"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+# ==============================================================================
+# 서버
+# ==============================================================================
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Server:
+    """임시 작업 폴더에서 실행하는 gunicorn (제출 DB, 캐시, 피드백 파일이 실제 운영 파일과 섞이지 않는다)"""
+
+    def __init__(self, args):
+        self.args = args
+        self.port = _free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self.workdir = tempfile.mkdtemp(prefix='loadtest-')
+        self.log_path = os.path.join(self.workdir, 'server.log')
+        self.process = None
+
+    def environment(self):
+        env = dict(os.environ)
+        env.update({
+            'MODEL_BACKEND': 'fake',
+            'WEB_CONCURRENCY': str(self.args.workers),
+            'FAKE_MODEL_LATENCY_MS': str(self.args.fake_latency_ms),
+            'FAKE_MODEL_CHUNKS': str(self.args.fake_chunks),
+            'FAKE_MODEL_CHUNK_DELAY_MS': str(self.args.fake_chunk_delay_ms),
+            'FAKE_MODEL_BLOCK_RATE': str(self.args.fake_block_rate),
+            'FAKE_MODEL_ERROR_RATE': str(self.args.fake_error_rate),
+            'FAKE_MODEL_SEED': str(self.args.seed),
+        })
+        return env
+
+    def start(self):
+        os.symlink(PASSAGE_FOLDER, os.path.join(self.workdir, 'json'))
+        command = [sys.executable, '-m', 'gunicorn', '--chdir', self.workdir, '--pythonpath', REPO_DIR,
+                   '--bind', f'127.0.0.1:{self.port}', '--workers', str(self.args.workers),
+                   '--timeout', '120', '--log-level', 'warning']
+        if self.args.serve_mode == 'async':
+            command += ['--worker-class', 'gevent', '--worker-connections', '1000']
+        command.append('main:app')
+        logger.info(f"gunicorn 시작 ({self.args.serve_mode}, 워커 {self.args.workers}개, 작업 폴더 {self.workdir})")
+        with open(self.log_path, 'w') as log_file:
+            self.process = subprocess.Popen(command, cwd=self.workdir, env=self.environment(),
+                                            stdout=log_file, stderr=subprocess.STDOUT)
+        self._wait_until_ready()
+
+    def _wait_until_ready(self, timeout=60.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn이 종료되었습니다 (코드 {self.process.returncode}). 로그: {self.log_path}")
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=2)
+                conn.request('GET', '/api/feedback')
+                if conn.getresponse().status == 200:
+                    conn.close()
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"{timeout:.0f}초 안에 서버가 준비되지 않았습니다. 로그: {self.log_path}")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self.args.keep_workdir:
+            logger.info(f"작업 폴더를 남겨 둡니다: {self.workdir}")
+        else:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+# ==============================================================================
+# 클라이언트
+# ==============================================================================
+
+class Client:
+    """가상 사용자 한 명. 연결(keep-alive가 가능하면 재사용), 쿠키, 설문 진행 상황을 유지한다."""
+
+    def __init__(self, base_url, texts, mix, unique_ratio, seed, timeout):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.texts = texts
+        self.routes = list(mix)
+        self.weights = [mix[route] for route in self.routes]
+        self.unique_ratio = unique_ratio
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.cookies = {}
+        self.progress = ''
+        self.current_page = None  # 마지막으로 받은 지문 (slot, id, 받은 시각)
+        self._conn = None
+
+    def _request(self, method, path, body=None, content_type=None):
+        headers = {}
+        if content_type:
+            headers['Content-Type'] = content_type
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                response = self._conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # 서버가 keep-alive 연결을 닫음: 새 연결로 한 번 더
+                self._conn.close()
+                self._conn = None
+                if attempt:
+                    raise
+        if response.will_close:
+            self._conn.close()
+            self._conn = None
+        for header in response.headers.get_all('Set-Cookie') or []:
+            name, _, value = header.split(';', 1)[0].partition('=')
+            self.cookies[name.strip()] = value.strip()
+        return response.status, data
+
+    def _json(self, method, path, payload):
+        return self._request(method, path, json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+                             'application/json')
+
+    def _summary_text(self):
+        text = self.rng.choice(self.texts)
+        if self.rng.random() < self.unique_ratio:
+            text += f" 부하 테스트 문장 {self.rng.getrandbits(64):x}."
+        return text
+
+    def run_once(self):
+        """섞기 비율에 따라 요청 하나를 보내고 (라우트, 상태 코드)를 반환"""
+        route = self.rng.choices(self.routes, self.weights)[0]
+        if route == 'post' and self.current_page is None:
+            route = 'page'
+
+        if route == 'page':
+            status, body = self._request('GET', '/page?' + urllib.parse.urlencode({'progress': self.progress}))
+            html = body.decode('utf-8', 'replace')
+            slot = _SLOT_RE.search(html)
+            if status == 200 and slot:
+                progress = _PROGRESS_RE.search(html)
+                title = _TITLE_RE.search(html)
+                self.progress = progress.group(1) if progress else self.progress
+                self.current_page = (slot.group(1), title.group(1) if title else '', time.monotonic())
+            elif status == 200:
+                self.progress = ''  # 모든 지문을 풀었음: 처음부터 다시
+            return route, status
+
+        if route == 'post':
+            slot, passage_id, shown_at = self.current_page
+            elapsed_ms = int((time.monotonic() - shown_at) * 1000)
+            form = {'slot': slot, 'progress': self.progress, 'id': passage_id,
+                    'Q1': str(self.rng.randint(1, 5)),
+                    'button_time': str(elapsed_ms // 2), 'submit_time': str(elapsed_ms - elapsed_ms // 2)}
+            for question in ('Q2', 'Q3', 'Q4', 'Q5', 'Q6'):
+                form[question] = self.rng.choice(['O', 'X', 'none'])
+            status, body = self._request('POST', '/post', urllib.parse.urlencode(form).encode('ascii'),
+                                         'application/x-www-form-urlencoded')
+            self.current_page = None
+            if status == 200:
+                query = urllib.parse.urlsplit(json.loads(body)['redirect_url']).query
+                self.progress = urllib.parse.parse_qs(query).get('progress', [''])[0]
+            return route, status
+
+        if route == 'summarize':
+            return route, self._json('POST', '/api/summarize', {'data': {'text': self._summary_text()}})[0]
+        if route == 'core-summary':
+            return route, self._json('POST', '/api/core-summary', {'data': {'text': self._summary_text()}})[0]
+        if route == 'sample-text':
+            return route, self._request('GET', '/api/sample-text')[0]
+        if route == 'feedback':
+            return route, self._json('POST', '/api/feedback', {'feedback': self.rng.choice(['yes', 'no'])})[0]
+        return route, self._json('POST', '/api/star-feedback', {'rating': self.rng.randint(1, 5)})[0]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def run_load(base_url, args):
+    """클라이언트 스레드들을 duration초 동안 돌리고, 워밍업 이후 요청의 (라우트, 상태, 지연 초) 목록을 반환"""
+    texts = _load_texts()
+    samples = []
+    samples_lock = threading.Lock()
+    start = time.monotonic()
+    measure_from = start + args.warmup
+    stop_at = measure_from + args.duration
+
+    def worker(index):
+        client = Client(base_url, texts, args.mix, args.unique_ratio, args.seed * 1000 + index, args.timeout)
+        local = []
+        try:
+            while True:
+                began = time.monotonic()
+                if began >= stop_at:
+                    break
+                try:
+                    route, status = client.run_once()
+                except (OSError, http.client.HTTPException, ValueError, KeyError) as e:
+                    logger.debug(f"요청 실패: {e}")
+                    route, status = 'transport-error', 0
+                    client.close()
+                if began >= measure_from:
+                    local.append((route, status, time.monotonic() - began))
+        finally:
+            client.close()
+        with samples_lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+# ==============================================================================
+# 결과 / 기준선 비교
+# ==============================================================================
+
+def summarize(samples, duration):
+    """라우트별 처리량, 지연 시간 백분위수(ms), 상태 코드별 건수"""
+    by_route = defaultdict(list)
+    for route, status, latency in samples:
+        by_route[route].append((status, latency))
+    by_route['total'] = [(status, latency) for _, status, latency in samples]
+
+    routes = {}
+    for route, entries in sorted(by_route.items()):
+        latencies = sorted(latency * 1000 for _, latency in entries)
+        statuses = defaultdict(int)
+        for status, _ in entries:
+            statuses[str(status)] += 1
+        errors = sum(count for status, count in statuses.items() if not status.startswith('2'))
+        stats = {
+            'requests': len(entries),
+            'throughput_rps': round(len(entries) / duration, 2),
+            'error_rate': round(errors / len(entries), 4) if entries else 0.0,
+            'status_counts': dict(sorted(statuses.items())),
+            'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else None,
+        }
+        for p in PERCENTILES:
+            value = _percentile(latencies, p)
+            stats[f'p{p}_ms'] = round(value, 2) if value is not None else None
+        routes[route] = stats
+    return routes
+
+
+def print_report(result):
+    header = f"{'route':<15}{'requests':>10}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}  status"
+    print(header)
+    print('-' * len(header))
+    for route, stats in result['routes'].items():
+        print(f"{route:<15}{stats['requests']:>10}{stats['throughput_rps']:>10.1f}"
+              f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+              f"{stats['error_rate']:>8.1%}  {stats['status_counts']}")
+
+
+def compare(baseline, result, threshold, min_delta_ms):
+    """기준선보다 나빠진 항목 목록. 지연 시간은 min_delta_ms 이하의 차이는 잡음으로 보고 무시한다."""
+    if baseline.get('config') != result.get('config'):
+        logger.warning("기준선과 실행 설정이 다릅니다. 비교 결과를 그대로 믿기 어렵습니다.")
+    regressions = []
+    for route, base in baseline['routes'].items():
+        current = result['routes'].get(route)
+        if current is None or not base['requests']:
+            continue
+        for p in PERCENTILES:
+            key = f'p{p}_ms'
+            if current[key] > base[key] * (1 + threshold) and current[key] - base[key] > min_delta_ms:
+                regressions.append(f"{route} {key}: {base[key]:.1f} -> {current[key]:.1f}")
+        if current['throughput_rps'] < base['throughput_rps'] * (1 - threshold):
+            regressions.append(f"{route} throughput_rps: {base['throughput_rps']:.1f} -> {current['throughput_rps']:.1f}")
+        if current['error_rate'] > base['error_rate'] + 0.01:
+            regressions.append(f"{route} error_rate: {base['error_rate']:.2%} -> {current['error_rate']:.2%}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='가짜 모델 백엔드를 쓰는 부하 테스트 / 벤치마크')
+    parser.add_argument('--url', help='이미 실행 중인 서버 주소 (없으면 gunicorn을 직접 띄움)')
+    parser.add_argument('--serve-mode', choices=['sync', 'async'], default='sync', help='gunicorn 워커 종류')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn 워커 수')
+    parser.add_argument('--clients', type=int, default=16, help='동시 가상 사용자 수')
+    parser.add_argument('--duration', type=float, default=20.0, help='측정 시간(초)')
+    parser.add_argument('--warmup', type=float, default=3.0, help='측정에서 제외하는 시작 구간(초)')
+    parser.add_argument('--timeout', type=float, default=90.0, help='요청 하나의 소켓 타임아웃(초)')
+    parser.add_argument('--mix', type=_parse_mix, default=DEFAULT_MIX,
+                        help='라우트별 가중치 (예: page=30,post=20,summarize=10)')
+    parser.add_argument('--unique-ratio', type=float, default=0.2, help='캐시를 피하는 요약 요청 비율')
+    parser.add_argument('--seed', type=int, default=0, help='클라이언트와 가짜 모델의 난수 시드')
+    parser.add_argument('--fake-latency-ms', type=float, default=200, help='가짜 모델의 첫 조각 지연')
+    parser.add_argument('--fake-chunks', type=int, default=5, help='가짜 모델 응답 조각 수')
+    parser.add_argument('--fake-chunk-delay-ms', type=float, default=20, help='가짜 모델 조각 사이 지연')
+    parser.add_argument('--fake-block-rate', type=float, default=0.0, help='가짜 모델이 차단하는 프롬프트 비율')
+    parser.add_argument('--fake-error-rate', type=float, default=0.0, help='가짜 모델 일시적 오류 확률')
+    parser.add_argument('--keep-workdir', action='store_true', help='서버 작업 폴더(로그, DB)를 지우지 않음')
+    parser.add_argument('--out', help='결과 JSON 저장 경로')
+    parser.add_argument('--save-baseline', metavar='PATH', help='결과를 기준선으로 저장')
+    parser.add_argument('--compare', metavar='PATH', help='이 기준선과 비교해 나빠졌으면 종료 코드 1')
+    parser.add_argument('--threshold', type=float, default=0.2, help='허용하는 악화 비율 (0.2 = 20%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help='이보다 작은 지연 시간 차이는 무시')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    server = None
+    if args.url:
+        base_url = args.url
+    else:
+        server = Server(args)
+        server.start()
+        base_url = server.url
+    try:
+        logger.info(f"부하 시작: 클라이언트 {args.clients}명, 워밍업 {args.warmup:.0f}초 + 측정 {args.duration:.0f}초")
+        samples = run_load(base_url, args)
+    finally:
+        if server is not None:
+            server.stop()
+
+    config = {key: getattr(args, key) for key in (
+        'serve_mode', 'workers', 'clients', 'duration', 'mix', 'unique_ratio', 'seed', 'fake_latency_ms',
+        'fake_chunks', 'fake_chunk_delay_ms', 'fake_block_rate', 'fake_error_rate')}
+    if args.url:
+        config['url'] = args.url
+    result = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'config': config,
+              'routes': summarize(samples, args.duration)}
+    print_report(result)
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    for path in (args.out, args.save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w', encoding='UTF-8') as f:
+                f.write(output)
+            logger.info(f"결과 저장: {path}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='UTF-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, result, args.threshold, args.min_delta_ms)
+        if regressions:
+            logger.error(f"기준선({args.compare})보다 나빠진 항목 {len(regressions)}개:")
+            for line in regressions:
+                logger.error(f"  {line}")
+            return 1
+        logger.info(f"기준선({args.compare}) 대비 허용 범위({args.threshold:.0%}) 안입니다.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""비동기(gevent) 서빙 모드에서 블로킹 파일/DB 작업을 이벤트 루프 밖으로 보내는 도우미
+
+gevent 워커에서는 소켓, time.sleep, threading 대기는 협력적으로 바뀌지만 SQLite, fsync, fcntl.flock 같은
+호출은 워커 전체를 멈춘다. run_blocking()은 이런 작업을 gevent 허브의 실제 OS 스레드 풀에서 실행하고,
+동기 모드(기본 gunicorn sync 워커, 개발 서버)에서는 그냥 바로 호출한다.
+"""
+
+
+def is_async_mode():
+    """gevent 몽키 패치가 적용된 프로세스인지 여부"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+
+def run_blocking(fn, *args, **kwargs):
+    if not is_async_mode():
+        return fn(*args, **kwargs)
+    import gevent
+    return gevent.get_hub().threadpool.apply(fn, args, kwargs)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""긴 글을 나누어 병렬로 요약한 뒤 합치는 map-reduce 요약"""
+import math
+import re
+import time
+
+# 한국어 지문 기준의 대략적인 글자 수/토큰 비율 (정확한 토큰 수는 모델 호출 없이는 알 수 없으므로 추정치 사용)
+CHARS_PER_TOKEN = 1.5
+
+_PARAGRAPH_SPLIT = re.compile(r'\n\s*\n|\n')
+_SENTENCE = re.compile(r'[^.!?。]+(?:[.!?。]+["”’)\]]*|$)')
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_sentences(text):
+    return [sentence.strip() for sentence in _SENTENCE.findall(text) if sentence.strip()]
+
+
+def count_sentences(text):
+    return len(split_sentences(text))
+
+
+def summary_ratio(sentence_count):
+    """요약 프롬프트 규칙 5: 20문장 이하면 최대 40%, 초과하면 최대 30% 분량"""
+    return 40 if sentence_count <= 20 else 30
+
+
+def _pieces(text, token_budget):
+    """예산을 넘지 않는 가장 큰 단위(문단 → 문장 → 글자)로 나눈 조각들"""
+    for paragraph in _PARAGRAPH_SPLIT.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= token_budget:
+            yield paragraph, '\n\n'
+            continue
+        for sentence in split_sentences(paragraph):
+            if estimate_tokens(sentence) <= token_budget:
+                yield sentence, ' '
+                continue
+            step = int(token_budget * CHARS_PER_TOKEN)
+            for start in range(0, len(sentence), step):
+                yield sentence[start:start + step], ''
+
+
+def split_into_chunks(text, token_budget):
+    """문단/문장 경계를 지키면서 각 조각이 token_budget(추정 토큰)을 넘지 않도록 묶는다."""
+    chunks = []
+    current = ''
+    for piece, separator in _pieces(text, token_budget):
+        candidate = f'{current}{separator}{piece}' if current else piece
+        if current and estimate_tokens(candidate) > token_budget:
+            chunks.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class TooManyChunks(ValueError):
+    """글이 너무 길어 max_chunks개보다 많은 조각으로 나뉘는 경우"""
+
+    def __init__(self, chunk_count, max_chunks):
+        super().__init__(f"글이 너무 깁니다. ({chunk_count}개 조각, 최대 {max_chunks}개)")
+        self.chunk_count = chunk_count
+        self.max_chunks = max_chunks
+
+
+def check_length(text, token_budget, max_chunks):
+    """나누기 전에 추정 토큰 수만으로 조각 수 한도를 넘는 글을 거른다 (TooManyChunks)"""
+    estimated = math.ceil(estimate_tokens(text) / token_budget)
+    if estimated > max_chunks:
+        raise TooManyChunks(estimated, max_chunks)
+
+
+def _run_all(executor, fn, items):
+    """fn(item)을 동시에 실행해 순서대로 결과를 반환. 하나라도 실패하면 아직 시작하지 않은 작업은 취소한다."""
+    futures = [executor.submit(fn, item) for item in items]
+    try:
+        return [future.result() for future in futures]
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _group_partials(partials, token_budget):
+    """이어 붙인 길이가 token_budget을 넘지 않도록 부분 요약(요약문, 원문 문장 수, 원문 글자 수)을 순서대로 묶는다.
+
+    묶음마다 최소 두 개씩 넣어 단계마다 개수가 줄어들게 한다.
+    """
+    groups, current = [], []
+    for partial in partials:
+        if len(current) >= 2 and estimate_tokens('\n\n'.join(p[0] for p in current + [partial])) > token_budget:
+            groups.append(current)
+            current = []
+        current.append(partial)
+    if len(current) == 1 and groups:
+        groups[-1].append(current[0])
+    elif current:
+        groups.append(current)
+    return groups
+
+
+def map_partials(text, map_fn, reduce_fn, executor, token_budget, max_chunks=None):
+    """text를 조각별로 map_fn(조각)으로 동시에 요약하고, 이어 붙인 부분 요약이 token_budget 안에 들어올 때까지
+    reduce_fn(부분 요약 목록, 원문 문장 수, 원문 글자 수)으로 몇 개씩 묶어 합친다.
+
+    (최종 통합 단계에 넘길 부분 요약 목록, 단계별 소요 시간 dict) 반환. 조각이 max_chunks개보다 많으면
+    모델을 호출하기 전에 TooManyChunks, map_fn/reduce_fn의 예외는 그대로 전달된다.
+    """
+    started = time.perf_counter()
+    if max_chunks is not None:
+        check_length(text, token_budget, max_chunks)
+    chunks = split_into_chunks(text, token_budget)
+    if max_chunks is not None and len(chunks) > max_chunks:
+        raise TooManyChunks(len(chunks), max_chunks)
+    split_done = time.perf_counter()
+
+    summaries = _run_all(executor, map_fn, chunks)
+    partials = [(summary, count_sentences(chunk), len(chunk)) for summary, chunk in zip(summaries, chunks)]
+    map_done = time.perf_counter()
+
+    # 부분 요약을 모두 이어 붙여도 예산을 넘으면, 몇 개씩 묶어 합치는 단계를 한 번 더 거친다.
+    rounds = 0
+    while len(partials) > 1 and estimate_tokens('\n\n'.join(p[0] for p in partials)) > token_budget:
+        groups = _group_partials(partials, token_budget)
+
+        def merge_group(group):
+            sentence_count, chars = sum(p[1] for p in group), sum(p[2] for p in group)
+            return reduce_fn([p[0] for p in group], sentence_count, chars), sentence_count, chars
+
+        partials = _run_all(executor, merge_group, groups)
+        rounds += 1
+
+    timings = {
+        'chunks': len(chunks),
+        'split_ms': round((split_done - started) * 1000, 1),
+        'map_ms': round((map_done - split_done) * 1000, 1),
+        'merge_rounds': rounds,
+        'merge_ms': round((time.perf_counter() - map_done) * 1000, 1),
+    }
+    return [p[0] for p in partials], timings
+
+
+def summarize_map_reduce(text, map_fn, reduce_fn, executor, token_budget, max_chunks=None):
+    """map_partials()로 부분 요약을 만든 뒤 reduce_fn(부분 요약 목록, 원문 문장 수, 원문 글자 수)으로 합친다.
+
+    (최종 요약문, 단계별 소요 시간 dict) 반환. 예외는 map_partials()와 같다.
+    """
+    started = time.perf_counter()
+    partials, timings = map_partials(text, map_fn, reduce_fn, executor, token_budget, max_chunks)
+    reduce_started = time.perf_counter()
+
+    result = reduce_fn(partials, count_sentences(text), len(text))
+    reduce_done = time.perf_counter()
+
+    timings['reduce_ms'] = round((reduce_done - reduce_started) * 1000, 1)
+    timings['total_ms'] = round((reduce_done - started) * 1000, 1)
+    return result, timings
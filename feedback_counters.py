@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""여러 워커 프로세스에서 안전하게 누적되는 피드백 카운터
+
+증가 요청은 메모리에만 더해 두고, 백그라운드 스레드가 flush_interval 초마다 모아서
+JSON 파일에 반영한다. 파일 갱신은 별도 잠금 파일의 fcntl.flock으로 프로세스 간 직렬화하고,
+임시 파일에 쓴 뒤 os.replace로 교체하므로 읽는 쪽은 항상 완전한 파일을 본다.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from blocking_io import run_blocking
+from metrics import FILE_IO_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingCounter:
+    """JSON 파일({키: 개수})에 저장되는 쓰기 병합 카운터"""
+
+    def __init__(self, path, keys, flush_interval=1.0):
+        self.path = path
+        self.keys = list(keys)
+        self.flush_interval = flush_interval
+        self._lock_path = path + '.lock'
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flusher = None
+        self._flusher_pid = None
+        with self._file_lock(fcntl.LOCK_EX):
+            if not os.path.exists(self.path):
+                self._write(self._initial())
+                logger.info(f"'{self.path}' 파일이 생성되었습니다.")
+        atexit.register(self.flush)
+
+    def _initial(self):
+        return {key: 0 for key in self.keys}
+
+    @contextmanager
+    def _file_lock(self, mode):
+        with open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return self._initial()
+
+    def _write(self, counts):
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(counts, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    # --- 증가 ---
+
+    def _ensure_flusher(self):
+        # fork된 워커에는 부모의 스레드가 없으므로 프로세스마다 새로 시작한다.
+        if self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        self._pending = {}
+        self._flusher = threading.Thread(target=self._run_flusher, name=f'counter-flush:{self.path}', daemon=True)
+        self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def increment(self, key, n=1):
+        """메모리에서만 카운트를 증가시킨다 (파일 반영은 백그라운드에서)"""
+        with self._lock:
+            self._ensure_flusher()
+            self._pending[key] = self._pending.get(key, 0) + n
+
+    def flush(self):
+        """대기 중인 증가분을 파일에 반영. 실패하면 증가분을 되돌려 다음 번에 다시 시도한다."""
+        if not self._pending:
+            return
+        run_blocking(self._flush)
+
+    def _flush(self):
+        # 파일 잠금을 먼저 잡아야 snapshot()이 증가분을 빠뜨리거나 두 번 세지 않는다.
+        with FILE_IO_SECONDS.time('feedback_flush', os.path.basename(self.path)), self._file_lock(fcntl.LOCK_EX):
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            try:
+                counts = self._read()
+                for key, n in pending.items():
+                    counts[key] = counts.get(key, 0) + n
+                self._write(counts)
+            except Exception as e:
+                logger.error(f"'{self.path}' 카운터 반영 중 오류 발생: {e}")
+                with self._lock:
+                    for key, n in pending.items():
+                        self._pending[key] = self._pending.get(key, 0) + n
+
+    # --- 조회 ---
+
+    def snapshot(self):
+        """파일에 반영된 값과 이 프로세스의 미반영 증가분을 합친 현재 카운트"""
+        return run_blocking(self._snapshot)
+
+    def _snapshot(self):
+        with FILE_IO_SECONDS.time('feedback_snapshot', os.path.basename(self.path)), self._file_lock(fcntl.LOCK_SH):
+            with self._lock:
+                pending = dict(self._pending)
+            counts = self._read()
+        for key, n in pending.items():
+            counts[key] = counts.get(key, 0) + n
+        return counts
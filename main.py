@@ -1,13 +1,28 @@
 # -*- coding: utf-8 -*-
-from flask import Flask, jsonify, render_template, request, redirect, url_for
+from flask import Flask, Response, g, jsonify, render_template, request, redirect, stream_with_context, url_for
 import json
 import os
 from datetime import datetime
-import random
 import logging
 import traceback
 import threading
-import google.generativeai as genai
+import time
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from passage_catalog import PassageCatalog
+from survey_progress import LeastAnsweredScheduler, decode_progress, encode_progress
+from submission_store import SubmissionStore
+from feedback_counters import CoalescingCounter
+from response_cache import ResponseCache, make_namespace
+from singleflight import SingleFlight
+from model_backends import create_model
+from sample_pool import SamplePool
+from chunked_summary import (TooManyChunks, check_length, count_sentences, estimate_tokens, map_partials,
+                             summarize_map_reduce, summary_ratio)
+from model_gateway import GatewayBusy, GatewayTimeout, ModelGateway, ProcessSlots
+from blocking_io import is_async_mode, run_blocking
+from metrics import CHARS_BUCKETS, FILE_IO_SECONDS, TOKENS_BUCKETS, REGISTRY as metrics_registry
 
 # ==============================================================================
 # 1. 통합 설정 및 초기화
@@ -20,61 +35,148 @@ app = Flask(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# --- 서빙 모드 ---
+# start.sh에서 SERVE_MODE=async로 실행하면 gunicorn gevent 워커가 앱을 불러오기 전에 표준 라이브러리를 패치한다.
+# 이때 모델 호출(소켓 I/O)은 다른 요청을 막지 않고 대기하며, 파일/DB 작업은 blocking_io.run_blocking으로 스레드 풀에서 실행된다.
+ASYNC_MODE = is_async_mode()
+
+# --- 지표(/metrics) 설정 ---
+# 값은 워커 메모리에 기록되고, 각 워커가 METRICS_DIR에 주기적으로 쓴 스냅숏을 /metrics에서 합쳐 보여준다.
+METRICS_DIR = 'metrics'
+HTTP_REQUESTS = metrics_registry.counter('http_requests_total', 'HTTP 요청 수', ('route', 'method', 'status'))
+HTTP_REQUEST_SECONDS = metrics_registry.histogram(
+    'http_request_duration_seconds', 'HTTP 요청 처리 시간(초, 스트리밍 응답은 스트림이 끝날 때까지)', ('route', 'method'))
+HTTP_IN_FLIGHT = metrics_registry.gauge('http_requests_in_flight', '처리 중인 HTTP 요청 수', ('route',))
+MODEL_CALLS = metrics_registry.counter(
+    'model_calls_total', 'AI 모델 호출 수 (outcome: ok, blocked, empty, busy, timeout, error, cancelled)', ('context', 'outcome'))
+MODEL_CALL_SECONDS = metrics_registry.histogram(
+    'model_call_duration_seconds', 'AI 모델 호출 시간(초, 게이트웨이 대기와 재시도 포함)', ('context', 'mode'))
+MODEL_IN_FLIGHT = metrics_registry.gauge('model_calls_in_flight', '진행 중인 AI 모델 호출 수', ('context',))
+MODEL_BLOCKED = metrics_registry.counter('model_blocked_total', '차단된 AI 모델 응답 수', ('context', 'reason'))
+MODEL_PROMPT_CHARS = metrics_registry.histogram('model_prompt_chars', '프롬프트 길이(글자)', ('context',), CHARS_BUCKETS)
+MODEL_PROMPT_TOKENS = metrics_registry.histogram('model_prompt_tokens', '프롬프트 길이(추정 토큰)', ('context',), TOKENS_BUCKETS)
+MODEL_RESPONSE_CHARS = metrics_registry.histogram('model_response_chars', '응답 길이(글자)', ('context',), CHARS_BUCKETS)
+MODEL_RESPONSE_TOKENS = metrics_registry.histogram(
+    'model_response_tokens', '응답 길이(토큰, usage_metadata가 없으면 추정치)', ('context',), TOKENS_BUCKETS)
+
+
+def _block_reason(response):
+    feedback = getattr(response, 'prompt_feedback', None)
+    return feedback.block_reason if feedback else None
+
+
+class _ModelCallMetrics:
+    """AI 모델 호출 한 번의 지표. 만들 때 시작되고 finish()/fail()은 처음 한 번만 반영된다."""
+
+    def __init__(self, context_log, prompt, stream=False):
+        self.context = context_log or '기타'
+        self.mode = 'stream' if stream else 'sync'
+        self.finished = False
+        self.started = time.perf_counter()
+        MODEL_IN_FLIGHT.inc(self.context)
+        MODEL_PROMPT_CHARS.observe(len(prompt), self.context)
+        MODEL_PROMPT_TOKENS.observe(estimate_tokens(prompt), self.context)
+
+    def finish(self, outcome, text='', response=None):
+        if self.finished:
+            return
+        self.finished = True
+        MODEL_IN_FLIGHT.dec(self.context)
+        MODEL_CALL_SECONDS.observe(time.perf_counter() - self.started, self.context, self.mode)
+        MODEL_CALLS.inc(self.context, outcome)
+        if outcome == 'blocked':
+            reason = _block_reason(response)
+            MODEL_BLOCKED.inc(self.context, getattr(reason, 'name', reason))
+        if text:
+            usage = getattr(response, 'usage_metadata', None)
+            MODEL_RESPONSE_CHARS.observe(len(text), self.context)
+            MODEL_RESPONSE_TOKENS.observe(getattr(usage, 'candidates_token_count', None) or estimate_tokens(text),
+                                          self.context)
+
+    def fail(self, error):
+        if isinstance(error, GatewayBusy):
+            self.finish('busy')
+        elif isinstance(error, GatewayTimeout):
+            self.finish('timeout')
+        else:
+            self.finish('error')
+
 # --- 설문조사 앱 설정 ---
 json_folder = 'json'  # 설문조사 json 파일이 있는 폴더
-if not os.path.exists('post'):
-    os.makedirs('post')  # 설문조사 결과 저장 폴더 생성
+PASSAGE_SLOT_FILE = 'passage_slots.json'  # 지문별 고정 슬롯 번호 (진행 상황 비트셋의 비트 위치)
+passage_catalog = PassageCatalog(json_folder, slot_file=PASSAGE_SLOT_FILE)  # 지문을 미리 읽어 색인 (변경 시 자동 재로딩)
+assignment_scheduler = LeastAnsweredScheduler()  # 응답 수가 가장 적은 지문부터 배정
+SUBMISSION_DB = 'submissions.db'  # 설문조사 결과 저장소 (SQLite WAL, 여러 워커 공유)
+submission_store = SubmissionStore(SUBMISSION_DB)
+atexit.register(submission_store.close)
+RESPONSE_COUNT_REFRESH_INTERVAL = 1.0  # 다른 워커의 제출을 응답 수에 반영하는 주기(초)
+SURVEY_ANALYTICS_STATE = 'survey_analytics.npz'  # 집계/체크포인트 (/api/analytics와 survey_analytics.py CLI가 함께 씀)
+SURVEY_ANALYTICS_SAVE_INTERVAL = 60.0  # /api/analytics가 새로 반영한 집계를 저장하는 최소 간격(초)
 
 # --- Google Generative AI 설정 ---
 API_KEY_PROVIDED = "YOUR_API_KEY_HERE"  # 여기에 실제 API 키를 입력하세요.
 MODEL_NAME = "gemini-2.0-flash"
 
-try:
-    api_key = os.environ.get("GEMINI_API_KEY", API_KEY_PROVIDED)
-    if not api_key or api_key == "YOUR_API_KEY_HERE":
-        raise ValueError("API 키가 제공되지 않았습니다. 환경 변수(GEMINI_API_KEY) 또는 코드 내(API_KEY_PROVIDED)에 키를 설정해주세요.")
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "gemini")  # "fake"이면 API 키 없이 로컬 가짜 모델 사용 (model_backends.py 참고)
 
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel(model_name=MODEL_NAME)
-    logger.info(f"Google Generative AI 모델 '{MODEL_NAME}'이(가) 성공적으로 초기화되었습니다.")
+try:
+    # gRPC는 gevent와 함께 쓰려면 별도 설정이 필요하므로, 비동기 모드에서는 REST 전송을 사용한다.
+    model = create_model(MODEL_BACKEND, MODEL_NAME, api_key=os.environ.get("GEMINI_API_KEY", API_KEY_PROVIDED),
+                         transport='rest' if ASYNC_MODE else None)
+    logger.info(f"AI 모델 백엔드 '{MODEL_BACKEND}' ({MODEL_NAME})이(가) 성공적으로 초기화되었습니다.")
 
 except Exception as e:
-    logger.error(f"Google Generative AI 초기화 중 심각한 오류 발생: {e}")
+    logger.error(f"AI 모델 초기화 중 심각한 오류 발생: {e}")
     logger.error(traceback.format_exc())
     model = None
 
+# --- AI 모델 게이트웨이 설정 ---
+# 모든 모델 호출은 게이트웨이를 거친다. 한도는 전체 기준이며 워커 수(WEB_CONCURRENCY)로 나누어 적용한다.
+MODEL_REQUESTS_PER_MINUTE = 1000
+MODEL_TOKENS_PER_MINUTE = 1_000_000
+MODEL_MAX_CONCURRENCY = 256 if ASYNC_MODE else 8  # 워커당 동시 모델 호출 수
+MODEL_MAX_QUEUE = 512 if ASYNC_MODE else 16  # 워커당 대기 가능한 요청 수 (초과 시 429)
+MODEL_REQUEST_DEADLINE = 60.0  # 요청당 대기 + 재시도 + 응답 시간 한도(초, start.sh의 gunicorn --timeout보다 짧아야 한다)
+MODEL_MAX_RETRIES = 3
+# 속도 제한에 걸렸을 때 기다리는 최대 시간(초). sync 워커는 기다리는 동안 다른 요청을 못 받으므로 짧게 두고 429로 거절한다.
+MODEL_MAX_RATE_WAIT = MODEL_REQUEST_DEADLINE / 2 if ASYNC_MODE else 1.0
+
+_worker_count = max(1, int(os.environ.get('WEB_CONCURRENCY', '1')))
+
+# sync 워커는 모델 응답을 기다리는 동안 다른 요청을 처리하지 못한다. 모델 호출을 진행할 수 있는 워커를
+# (워커 수 - 1)개로 제한해 설문조사 요청을 받을 워커를 항상 하나 남기고, 빈 슬롯이 없으면 바로 429로 거절한다.
+# (워커가 하나뿐이면 남길 수 없으므로 start.sh는 여러 워커로 실행한다.) gevent 워커는 기다리는 동안에도
+# 다른 요청을 받으므로 워커 간 슬롯을 쓰지 않는다.
+MODEL_GATEWAY_LOCK_DIR = os.path.join('.locks', 'gateway')
+MODEL_WORKER_SLOTS = max(1, _worker_count - 1)
+model_worker_slots = None if ASYNC_MODE else ProcessSlots(MODEL_GATEWAY_LOCK_DIR, MODEL_WORKER_SLOTS)
+if model_worker_slots is not None and _worker_count == 1:
+    logger.warning("sync 워커가 하나뿐이라 AI 요청이 설문조사 요청을 막을 수 있습니다. WEB_CONCURRENCY를 2 이상으로 설정하세요.")
+
+model_gateway = ModelGateway(
+    lambda: model,
+    requests_per_minute=MODEL_REQUESTS_PER_MINUTE / _worker_count,
+    tokens_per_minute=MODEL_TOKENS_PER_MINUTE / _worker_count,
+    max_concurrency=MODEL_MAX_CONCURRENCY,
+    max_queue=MODEL_MAX_QUEUE,
+    deadline=MODEL_REQUEST_DEADLINE,
+    max_retries=MODEL_MAX_RETRIES,
+    process_slots=model_worker_slots,
+    max_rate_wait=MODEL_MAX_RATE_WAIT,
+)
+
 # --- 피드백 저장 설정 ---
-feedback_lock = threading.Lock()
+# 투표는 메모리에서 증가시키고 1초마다 모아서 파일에 반영 (여러 워커 사이는 파일 잠금으로 병합)
+FEEDBACK_FLUSH_INTERVAL = 1.0
 
 # Yes/No 피드백 파일
 FEEDBACK_FILE = 'feedback_counts.json'
+feedback_counter = CoalescingCounter(FEEDBACK_FILE, ["yes", "no"], flush_interval=FEEDBACK_FLUSH_INTERVAL)
 
-
-def _initialize_feedback_file():
-    with feedback_lock:
-        if not os.path.exists(FEEDBACK_FILE):
-            with open(FEEDBACK_FILE, 'w') as f:
-                json.dump({"yes": 0, "no": 0}, f, indent=2)
-            logger.info(f"'{FEEDBACK_FILE}' 파일이 생성되었습니다.")
-
-
-# 별점 피드백 파일
+# 별점 피드백 파일: 각 별점에 대한 카운트 {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
 STAR_FEEDBACK_FILE = 'star_feedback.json'
-
-
-def _initialize_star_feedback_file():
-    with feedback_lock:
-        if not os.path.exists(STAR_FEEDBACK_FILE):
-            # 초기 구조: 각 별점에 대한 카운트
-            initial_data = {str(i): 0 for i in range(1, 6)}  # {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
-            with open(STAR_FEEDBACK_FILE, 'w') as f:
-                json.dump(initial_data, f, indent=2)
-            logger.info(f"'{STAR_FEEDBACK_FILE}' 파일이 생성되었습니다.")
-
-
-# 앱 시작 시 각 피드백 파일 초기화
-_initialize_feedback_file()
-_initialize_star_feedback_file()
+star_feedback_counter = CoalescingCounter(STAR_FEEDBACK_FILE, [str(i) for i in range(1, 6)],
+                                          flush_interval=FEEDBACK_FLUSH_INTERVAL)
 
 # --- AI 프롬프트 템플릿 ---
 SUMMARY_PROMPT_TEMPLATE = (
@@ -102,6 +204,17 @@ CORE_SUMMARY_PROMPT_TEMPLATE = (
     "\n\n--- 핵심 요약문 ---:"
 )
 
+# 긴 글을 나누어 요약한 부분 요약문들을 하나로 합치는 프롬프트 (규칙 5의 분량 비율은 원문 기준으로 계산해 넣는다)
+REDUCE_SUMMARY_PROMPT_TEMPLATE = (
+    "다음은 하나의 긴 글을 순서대로 나누어 각각 요약한 부분 요약문들입니다. "
+    "이들을 원문의 논리적 흐름에 맞게 하나의 통합된 요약문으로 재구성해주세요. "
+    "부분 요약문 사이의 중복은 제거하고, 중심 논지와 중요 키워드, 주요 사례 또는 정의는 반드시 유지합니다. "
+    "원문은 총 {sentence_count}문장이므로, 최종 요약문은 원문 분량({original_chars}자)의 최대 {ratio}%인 약 {max_chars}자 이내로 작성합니다. "
+    "요약문은 문단 단위가 아닌 하나의 통합된 문장 흐름으로 출력하며, 어조는 문어체, 평서문, 중립적 어조를 유지합니다."
+    "\n\n--- 부분 요약문 ---:\n{text_to_summarize}"
+    "\n\n--- 요약문 ---:"
+)
+
 SAMPLE_TEXT_GENERATION_PROMPT = (
     "흥미로운 주제에 대한 한국어 비문학 지문을 생성해주세요. "
     "이 지문은 최소 4개의 문단으로 구성되어야 하며, 각 문단은 명확한 내용을 담고 있어야 합니다. "
@@ -109,6 +222,61 @@ SAMPLE_TEXT_GENERATION_PROMPT = (
     "지문 내용만 응답으로 생성하고, 다른 부가적인 설명은 포함하지 마세요."
 )
 
+# --- AI 응답 캐시 설정 ---
+# 모델 백엔드·이름이나 프롬프트 템플릿이 바뀌면 네임스페이스가 달라져 기존 캐시가 모두 무효화된다.
+RESPONSE_CACHE_FILE = 'response_cache.db'
+RESPONSE_CACHE_TTL = 7 * 24 * 3600  # 캐시 유지 시간(초)
+response_cache = ResponseCache(
+    RESPONSE_CACHE_FILE,
+    namespace=make_namespace(MODEL_BACKEND, MODEL_NAME, SUMMARY_PROMPT_TEMPLATE, CORE_SUMMARY_PROMPT_TEMPLATE,
+                             REDUCE_SUMMARY_PROMPT_TEMPLATE),
+    ttl=RESPONSE_CACHE_TTL,
+)
+
+# --- 긴 글 분할 요약 설정 ---
+# 추정 토큰 수가 예산을 넘는 글은 문단/문장 단위로 나누어 동시에 요약한 뒤 합친다. 짧은 글은 기존처럼 한 번에 요약.
+CHUNK_TOKEN_BUDGET = 3000
+# 이보다 많은 조각으로 나뉘는 글은 모델을 호출하지 않고 413으로 거절한다. (부분 요약 호출이 속도 제한 한도를
+# 다 쓰고 나서야 429로 실패하는 일을 막는다.) 분할 요약 전체가 MODEL_REQUEST_DEADLINE 하나 안에서 끝나야 한다.
+MAX_SUMMARY_CHUNKS = 8
+SUMMARY_MAP_CONCURRENCY = 4  # 부분 요약을 동시에 처리하는 최대 개수 (모든 요청 공유)
+summary_map_executor = ThreadPoolExecutor(max_workers=SUMMARY_MAP_CONCURRENCY, thread_name_prefix='summary-map')
+
+# --- 샘플 지문 풀 설정 ---
+SAMPLE_POOL_FOLDER = 'sample_pool'  # 미리 생성한 샘플 지문 저장 폴더
+SAMPLE_POOL_CAPACITY = 20  # 보충 시 목표 개수
+SAMPLE_POOL_LOW_WATER = 5  # 이 개수 미만이 되면 백그라운드에서 보충
+SAMPLE_POOL_MAX_USES = 3  # 지문 하나를 제공하는 최대 횟수
+SAMPLE_COOKIE = 'last_sample'  # 같은 사용자에게 같은 지문을 연속으로 주지 않기 위한 쿠키
+
+
+def _generate_sample_text():
+    """샘플 지문 하나를 모델로 생성 (풀 보충과 풀이 비었을 때의 직접 호출에 사용)"""
+    logger.info("AI 모델에 샘플 텍스트 생성 요청 전송 중...")
+    call_metrics = _ModelCallMetrics("샘플 텍스트", SAMPLE_TEXT_GENERATION_PROMPT)
+    try:
+        response = model_gateway.generate(SAMPLE_TEXT_GENERATION_PROMPT)
+        text = response.text.strip()
+    except Exception as e:
+        call_metrics.fail(e)
+        raise
+    logger.info("AI 모델로부터 샘플 텍스트 응답 수신 완료.")
+    if not text:
+        call_metrics.finish('blocked' if _block_reason(response) else 'empty', response=response)
+        raise ValueError('AI 모델이 빈 샘플 텍스트를 반환했습니다.')
+    call_metrics.finish('ok', text, response)
+    return text
+
+
+sample_pool = SamplePool(SAMPLE_POOL_FOLDER, _generate_sample_text, capacity=SAMPLE_POOL_CAPACITY,
+                         low_water=SAMPLE_POOL_LOW_WATER, max_uses=SAMPLE_POOL_MAX_USES)
+if model is not None:
+    sample_pool.start()
+
+# --- 동일 요청 병합 설정 ---
+MODEL_FLIGHT_LOCK_DIR = os.path.join('.locks', 'model')  # 워커 간 병합에 쓰는 키별 잠금 파일 폴더
+
+
 @app.route('/prompt')
 def show_my_cat_image():
     """/my-cat URL로 접속 시 특별한 고양이 이미지를 보여주는 페이지"""
@@ -120,61 +288,343 @@ def show_my_cat_image():
 # 2. 헬퍼 함수
 # ==============================================================================
 
-def get_random_json(page):
-    """설문조사 json 폴더에서 랜덤한 JSON 파일 선택"""
-    files = [f for f in os.listdir(json_folder) if f.endswith('.json')]
-    if not files:
-        return None
-    random.shuffle(files)
-    for i in files:
-        file_path = os.path.join(json_folder, i)
-        try:
-            with open(file_path, 'r', encoding='UTF-8') as json_file:
-                data = json.load(json_file)
-                # id와 page가 문자열이고 2진수 형태라고 가정
-                if (int(data['id'], 2) & int(page, 2) != 0):
-                    continue
-                return data
-        except (IOError, json.JSONDecodeError, KeyError) as e:
-            logger.error(f"파일 '{file_path}' 처리 중 오류 발생: {e}")
-            continue
-    return None
+_scheduler_catalog_version = None
 
 
-def _generate_text_from_model(prompt_template, text_input, context_log=""):
-    """AI 모델을 호출하고 결과를 반환하는 범용 함수"""
+def _sync_scheduler():
+    """카탈로그가 바뀌었으면 스케줄러의 슬롯 목록을 맞춘다."""
+    global _scheduler_catalog_version
+    if _scheduler_catalog_version != passage_catalog.version:
+        assignment_scheduler.sync(passage['_slot'] for passage in passage_catalog.passages())
+        _scheduler_catalog_version = passage_catalog.version
+
+
+_response_count_seq = 0
+_response_count_checked = 0.0
+_response_count_lock = threading.Lock()
+
+
+def _refresh_response_counts():
+    """저장소에 새로 기록된 제출(모든 워커)을 스케줄러의 응답 수에 반영"""
+    global _response_count_seq, _response_count_checked
+    if time.monotonic() - _response_count_checked < RESPONSE_COUNT_REFRESH_INTERVAL:
+        return
+    if not _response_count_lock.acquire(blocking=False):
+        return
+    try:
+        _response_count_checked = time.monotonic()
+        counts, _response_count_seq = submission_store.counts_by_slot(_response_count_seq)
+        for slot, count in counts.items():
+            assignment_scheduler.record(slot, count)
+    except Exception as e:
+        logger.error(f"응답 수 갱신 중 오류 발생: {e}")
+    finally:
+        _response_count_lock.release()
+
+
+def choose_passage(done_slots):
+    """완료한 지문과 id 비트마스크가 겹치지 않는 지문 중 응답 수가 가장 적은 지문 선택"""
+    _sync_scheduler()
+    _refresh_response_counts()
+    conflict = passage_catalog.conflict_mask(done_slots)
+
+    def is_eligible(slot):
+        passage = passage_catalog.by_slot(slot)
+        return passage is not None and slot not in done_slots and passage['_mask'] & conflict == 0
+
+    slot = assignment_scheduler.choose(is_eligible)
+    return None if slot is None else passage_catalog.by_slot(slot)
+
+
+class ModelResponseError(Exception):
+    """AI 모델 호출 실패. message와 함께 클라이언트에 돌려줄 HTTP 상태 코드를 담는다."""
+
+    def __init__(self, message, status_code=500, retry_after=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after  # 429일 때 Retry-After 헤더 값(초)
+
+
+def _model_error_response(error):
+    """ModelResponseError를 JSON 오류 응답으로 변환"""
+    response = jsonify({'error': error.message})
+    response.status_code = error.status_code
+    if error.retry_after:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+# 다른 워커의 동일 요청을 기다리는 follower도 모델 호출처럼 워커를 차지하므로 워커 간 슬롯을 잡는다.
+model_flight = SingleFlight(MODEL_FLIGHT_LOCK_DIR, error_factory=ModelResponseError,
+                            wait_guard=model_gateway.hold_worker, wait_timeout=MODEL_REQUEST_DEADLINE)
+
+
+def _generate_text(prompt_template, text_input, context_log="", deadline_at=None):
+    """AI 모델(또는 응답 캐시)에서 결과 텍스트를 얻는다. 실패 시 ModelResponseError 발생.
+
+    deadline_at: 여러 번 호출하는 요청의 전체 마감 시각(time.monotonic 기준, 없으면 호출마다 MODEL_REQUEST_DEADLINE)
+    """
     if model is None:
         logger.error(f"AI 모델이 초기화되지 않아 {context_log} 요청을 처리할 수 없습니다.")
-        return jsonify({'error': 'AI 모델을 초기화하는 데 실패했습니다. 서버 로그를 확인해주세요.'}), 500
+        raise ModelResponseError('AI 모델을 초기화하는 데 실패했습니다. 서버 로그를 확인해주세요.', 500)
+
+    cache_key = response_cache.key(prompt_template, text_input)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"{context_log} 응답 캐시 적중.")
+        return cached
 
+    # 같은 템플릿과 텍스트로 동시에 들어온 요청은 (다른 워커 포함) 모델 호출 한 번을 공유한다.
+    try:
+        wait_timeout = None if deadline_at is None else max(0.0, deadline_at - time.monotonic())
+        return model_flight.do(cache_key, lambda: _generate_uncached(cache_key, prompt_template, text_input, context_log,
+                                                                     deadline_at),
+                               wait_timeout=wait_timeout)
+    except GatewayBusy as e:
+        # 다른 워커의 동일 요청을 기다릴 슬롯이 없음
+        logger.warning(f"{context_log} 요청 거절: {e}")
+        raise ModelResponseError(str(e), 429, retry_after=e.retry_after)
+
+
+def _generate_uncached(cache_key, prompt_template, text_input, context_log, deadline_at=None):
+    # 다른 워커의 동일 요청을 기다렸다면 그 결과가 이미 캐시에 있다. (같은 요청의 두 번째 확인이므로 통계에서 제외)
+    cached = response_cache.get(cache_key, count=False)
+    if cached is not None:
+        return cached
+
+    full_prompt = prompt_template.format(text_to_summarize=text_input)
+    call_metrics = _ModelCallMetrics(context_log, full_prompt)
     try:
-        full_prompt = prompt_template.format(text_to_summarize=text_input)
         logger.info(f"AI 모델에 {context_log} 요청 전송 중...")
-        response = model.generate_content(full_prompt)
+        response = model_gateway.generate(full_prompt, deadline_at=deadline_at)
         logger.info(f"AI 모델로부터 {context_log} 응답 수신 완료.")
 
         result_text = response.text
         if not result_text.strip():
             if response.prompt_feedback and response.prompt_feedback.block_reason:
+                call_metrics.finish('blocked', response=response)
                 error_message = f"콘텐츠 생성 중 API에 의해 차단되었습니다. 이유: {response.prompt_feedback.block_reason}"
                 logger.error(error_message)
-                return jsonify({'error': error_message}), 400
+                raise ModelResponseError(error_message, 400)
             else:
+                call_metrics.finish('empty')
                 logger.warning(f"AI 모델이 빈 {context_log} 결과를 반환했습니다.")
-                return jsonify({'error': f'AI 모델이 {context_log} 결과를 생성하지 못했습니다.'}), 500
+                raise ModelResponseError(f'AI 모델이 {context_log} 결과를 생성하지 못했습니다.', 500)
+        call_metrics.finish('ok', result_text, response)
+
+    except ModelResponseError:
+        raise
+    except GatewayBusy as e:
+        call_metrics.fail(e)
+        logger.warning(f"{context_log} 요청 거절: {e}")
+        raise ModelResponseError(str(e), 429, retry_after=e.retry_after)
+    except GatewayTimeout as e:
+        call_metrics.fail(e)
+        logger.error(f"{context_log} 요청 시간 초과: {e}")
+        raise ModelResponseError(str(e), 504)
+    except Exception as e:
+        call_metrics.fail(e)
+        logger.error(f"'{context_log}' 처리 중 예상치 못한 오류 발생: {e}")
+        logger.error(traceback.format_exc())
+        raise ModelResponseError(f'서버 내부 오류가 발생했습니다: {str(e)}', 500)
+
+    result_text = result_text.strip()
+    response_cache.put(cache_key, result_text)
+    return result_text
+
+
+def _reduce_template(sentence_count, original_chars):
+    """원문 분량에 맞춘 부분 요약 통합 프롬프트 템플릿"""
+    ratio = summary_ratio(sentence_count)
+    return REDUCE_SUMMARY_PROMPT_TEMPLATE.format(
+        sentence_count=sentence_count, original_chars=original_chars, ratio=ratio,
+        max_chars=original_chars * ratio // 100, text_to_summarize='{text_to_summarize}')
 
-        return jsonify({'result': result_text.strip()}), 200
 
+def _chunked_summary_steps(deadline_at):
+    """분할 요약의 (부분 요약 함수, 통합 함수). 모든 단계가 요청 하나의 마감 시각 deadline_at을 함께 쓴다."""
+    def summarize_chunk(chunk):
+        return _generate_text(SUMMARY_PROMPT_TEMPLATE, chunk, context_log="일반 요약(부분)", deadline_at=deadline_at)
+
+    def merge_partials(partials, sentence_count, original_chars):
+        return _generate_text(_reduce_template(sentence_count, original_chars), '\n\n'.join(partials),
+                              context_log="일반 요약(통합)", deadline_at=deadline_at)
+
+    return summarize_chunk, merge_partials
+
+
+def _generate_chunked_summary(text_input):
+    """긴 글을 map-reduce로 요약. (요약문, 단계별 소요 시간) 반환, 실패 시 ModelResponseError 발생."""
+    deadline_at = time.monotonic() + MODEL_REQUEST_DEADLINE
+    summarize_chunk, merge_partials = _chunked_summary_steps(deadline_at)
+    try:
+        result, timings = summarize_map_reduce(text_input, summarize_chunk, merge_partials,
+                                               summary_map_executor, CHUNK_TOKEN_BUDGET, MAX_SUMMARY_CHUNKS)
+    except TooManyChunks as e:
+        raise ModelResponseError(str(e), 413)
+    logger.info(f"분할 요약 완료: {timings}")
+    return result, timings
+
+
+def _generate_text_from_model(prompt_template, text_input, context_log=""):
+    """AI 모델을 호출하고 결과를 반환하는 범용 함수"""
+    try:
+        return jsonify({'result': _generate_text(prompt_template, text_input, context_log)}), 200
+    except ModelResponseError as e:
+        return _model_error_response(e)
+
+
+def _sse_event(event, payload):
+    """server-sent events 형식의 이벤트 한 개"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def _stream_response_from_model(full_prompt, context_log="", cache_key=None, deadline_at=None):
+    """AI 모델의 스트리밍 응답을 SSE로 보내는 응답 객체를 만든다.
+
+    생성되는 대로 'chunk' 이벤트({'text': ...})를 보내고, 마지막에 'done'({'chars': 전체 글자 수}) 또는
+    'error'({'error': 메시지, 'status': HTTP 상태 코드}) 이벤트 하나로 끝난다. 전체 텍스트는 chunk를 이어 붙인 것이다.
+    게이트웨이 슬롯은 응답을 시작하기 전에 확보하므로, 대기열이 가득 차면 스트림 대신 429를 바로 돌려준다.
+    deadline_at을 넘기면 앞선 단계(분할 요약의 부분 요약)와 같은 마감 시각을 쓴다.
+    """
+    if model is None:
+        logger.error(f"AI 모델이 초기화되지 않아 {context_log} 요청을 처리할 수 없습니다.")
+        return _sse_response(iter([_sse_event('error', {'error': 'AI 모델을 초기화하는 데 실패했습니다. 서버 로그를 확인해주세요.',
+                                                        'status': 500})]))
+
+    if cache_key is not None:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"{context_log} 응답 캐시 적중.")
+            return _sse_response(iter([_sse_event('chunk', {'text': cached}),
+                                       _sse_event('done', {'chars': len(cached)})]))
+
+    call_metrics = _ModelCallMetrics(context_log, full_prompt, stream=True)
+    slot = ExitStack()
+    try:
+        deadline_at = slot.enter_context(model_gateway.admit(deadline_at=deadline_at))
+    except GatewayBusy as e:
+        call_metrics.fail(e)
+        logger.warning(f"{context_log} 스트리밍 요청 거절: {e}")
+        return _model_error_response(ModelResponseError(str(e), 429, retry_after=e.retry_after))
+
+    response = _sse_response(_stream_events(full_prompt, deadline_at, context_log, cache_key, call_metrics))
+    # 스트림이 끝나거나 클라이언트가 연결을 끊으면 슬롯을 반납한다.
+    response.call_on_close(slot.close)
+    response.call_on_close(lambda: call_metrics.finish('cancelled'))
+    return response
+
+
+def _stream_events(full_prompt, deadline_at, context_log, cache_key, call_metrics):
+    try:
+        logger.info(f"AI 모델에 {context_log} 스트리밍 요청 전송 중...")
+        response = model_gateway.call(full_prompt, deadline_at, stream=True)
+        parts = []
+        for chunk in response:
+            if time.monotonic() > deadline_at:
+                # 스트림도 마감 시간 안에 끝나야 gunicorn 워커 타임아웃 전에 오류 이벤트를 보낼 수 있다.
+                raise GatewayTimeout('AI 모델 응답 마감 시간이 지났습니다.')
+            try:
+                text = chunk.text
+            except ValueError:
+                # 안전 필터 등으로 텍스트가 없는 조각
+                continue
+            if text:
+                parts.append(text)
+                yield _sse_event('chunk', {'text': text})
+        logger.info(f"AI 모델로부터 {context_log} 스트리밍 응답 수신 완료.")
+
+        result_text = ''.join(parts).strip()
+        if not result_text:
+            if response.prompt_feedback and response.prompt_feedback.block_reason:
+                call_metrics.finish('blocked', response=response)
+                error_message = f"콘텐츠 생성 중 API에 의해 차단되었습니다. 이유: {response.prompt_feedback.block_reason}"
+                logger.error(error_message)
+                yield _sse_event('error', {'error': error_message, 'status': 400})
+            else:
+                call_metrics.finish('empty')
+                logger.warning(f"AI 모델이 빈 {context_log} 결과를 반환했습니다.")
+                yield _sse_event('error', {'error': f'AI 모델이 {context_log} 결과를 생성하지 못했습니다.', 'status': 500})
+            return
+
+        call_metrics.finish('ok', result_text, response)
+        if cache_key is not None:
+            response_cache.put(cache_key, result_text)
+        yield _sse_event('done', {'chars': len(result_text)})
+
+    except GatewayBusy as e:
+        call_metrics.fail(e)
+        logger.warning(f"{context_log} 스트리밍 요청 거절: {e}")
+        yield _sse_event('error', {'error': str(e), 'status': 429, 'retry_after': e.retry_after})
+    except GatewayTimeout as e:
+        call_metrics.fail(e)
+        logger.error(f"{context_log} 스트리밍 요청 시간 초과: {e}")
+        yield _sse_event('error', {'error': str(e), 'status': 504})
     except Exception as e:
-        logger.error(f"'{context_log}' 처리 중 예상치 못한 오류 발생: {e}")
+        call_metrics.fail(e)
+        logger.error(f"'{context_log}' 스트리밍 처리 중 예상치 못한 오류 발생: {e}")
         logger.error(traceback.format_exc())
-        return jsonify({'error': f'서버 내부 오류가 발생했습니다: {str(e)}'}), 500
+        yield _sse_event('error', {'error': f'서버 내부 오류가 발생했습니다: {str(e)}', 'status': 500})
+
+
+def _sse_response(events):
+    """SSE 제너레이터를 버퍼링 없이 바로 흘려보내는 응답"""
+    return Response(stream_with_context(events), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def _get_text_to_summarize():
+    """요약 API 요청 본문({'data': {'text': ...}})에서 텍스트를 꺼낸다. (텍스트, 오류 응답) 반환"""
+    if not request.is_json:
+        return None, (jsonify({'error': '요청은 JSON 형식이어야 합니다.'}), 400)
+
+    request_data = request.get_json()
+    # 'data' 키를 먼저 확인하고, 그 안에서 'text'를 찾도록 수정
+    data_payload = request_data.get('data', {})
+    text_to_summarize = data_payload.get('text')
+
+    if not text_to_summarize or not isinstance(text_to_summarize, str) or not text_to_summarize.strip():
+        return None, (jsonify({'error': '요약할 텍스트(text)는 비어있지 않은 문자열이어야 합니다.'}), 400)
+    try:
+        check_length(text_to_summarize, CHUNK_TOKEN_BUDGET, MAX_SUMMARY_CHUNKS)
+    except TooManyChunks as e:
+        return None, (jsonify({'error': str(e)}), 413)
+    return text_to_summarize, None
 
 
 # ==============================================================================
 # 3. 라우트(Routes) 정의
 # ==============================================================================
 
+# --- 요청 지표 ---
+
+@app.before_request
+def _start_request_metrics():
+    metrics_registry.start(METRICS_DIR)
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.request_metrics = (route, time.perf_counter())
+    HTTP_IN_FLIGHT.inc(route)
+
+
+@app.after_request
+def _record_request_metrics(response):
+    started = g.pop('request_metrics', None)
+    if started is None:
+        return response
+    route, started_at = started
+    method, status = request.method, response.status_code
+
+    def record():
+        HTTP_IN_FLIGHT.dec(route)
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started_at, route, method)
+        HTTP_REQUESTS.inc(route, method, status)
+
+    # 응답 본문을 다 보내거나 연결이 끊겨 응답이 닫힐 때 기록하므로, 스트리밍 응답도 전체 시간이 잡힌다.
+    response.call_on_close(record)
+    return response
+
+
 # --- 설문조사 앱 라우트 ---
 
 @app.route('/survey')
@@ -189,20 +639,23 @@ def survey_page():
     ip_address = request.remote_addr
     logger.info(f"설문조사 페이지 접근 - IP: {ip_address}")
 
-    page = request.args.get('page', '00000000')
-    if (page == '11111111'):
-        return render_template('39.html')  # 설문 완료 페이지
+    try:
+        done_slots = decode_progress(request.args.get('progress', ''), max_slot=passage_catalog.max_slot())
+    except ValueError as e:
+        logger.warning(f"{e} - IP: {ip_address}")
+        done_slots = set()
 
-    data = get_random_json(page)
+    data = choose_passage(done_slots)
     if data is None:
-        return render_template('39.html')
+        return render_template('39.html')  # 설문 완료 페이지
 
     return render_template('index.html', text=str(data["text"]).replace("\n", "<br>"),
                            Q1_1=str(data["q1_1"]), Q1_2=str(data["q1_2"]),
                            Q1_3=str(data["q1_3"]), Q1_4=str(data["q1_4"]),
                            Q1_5=str(data["q1_5"]), Q2=str(data['q2']),
                            Q3=str(data['q3']), Q4=str(data['q4']),
-                           Q5=str(data['q5']), id=str(data['id']))
+                           Q5=str(data['q5']), id=str(data['id']),
+                           slot=data['_slot'], progress=encode_progress(done_slots))
 
 
 @app.route('/post', methods=['POST'])
@@ -212,24 +665,71 @@ def save_survey_post():
     logger.info(f"설문조사 제출 요청 - IP: {ip_address}")
 
     data = request.form.to_dict()
+    try:
+        slot = int(data.get('slot', ''))
+        done_slots = decode_progress(data.get('progress', ''), max_slot=passage_catalog.max_slot())
+    except ValueError:
+        return jsonify({'error': '잘못된 설문 진행 정보입니다.'}), 400
+    if passage_catalog.by_slot(slot) is None:
+        return jsonify({'error': '존재하지 않는 지문입니다.'}), 400
+
     data['ip'] = ip_address
     data['timestamp_utc'] = datetime.utcnow().isoformat()
 
-    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-    filename = f'post/{timestamp}_{ip_address.replace(":", "_")}.json'
-
-    with open(filename, 'w', encoding='UTF-8') as json_file:
-        json.dump(data, json_file, ensure_ascii=False, indent=2)
+    try:
+        with FILE_IO_SECONDS.time('submission_submit', SUBMISSION_DB):
+            submission_store.submit(data)
+    except Exception as e:
+        logger.error(f"설문조사 데이터 저장 중 오류 발생: {e}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': '설문조사 결과를 저장하지 못했습니다.'}), 500
 
-    logger.info(f"설문조사 데이터 저장 완료: {filename}")
+    logger.info(f"설문조사 데이터 저장 완료 - 지문 슬롯: {slot}")
 
-    next_page_val = int(data.get('page', '0'), 2) + int(data.get('id', '0'), 2)
-    redirect_page_str = bin(next_page_val)[2:].zfill(8)
+    done_slots.add(slot)
 
-    redirect_url = url_for('survey_page', page=redirect_page_str)
+    redirect_url = url_for('survey_page', progress=encode_progress(done_slots))
     return jsonify({"redirect_url": redirect_url})
 
 
+_survey_analytics = None
+_survey_analytics_lock = threading.Lock()
+_survey_analytics_saved_seq = 0
+_survey_analytics_saved_at = 0.0
+
+
+@app.route('/api/analytics', methods=['GET'])
+def get_survey_analytics():
+    """설문조사 결과 집계 API (대시보드용). 호출할 때마다 새로 들어온 제출만 반영한다.
+
+    반영한 집계는 SURVEY_ANALYTICS_SAVE_INTERVAL마다 체크포인트 파일에 저장하므로, 재시작한 워커나 다른 워커도
+    마지막 체크포인트 이후의 제출만 읽는다.
+    """
+    global _survey_analytics, _survey_analytics_saved_seq, _survey_analytics_saved_at
+    # numpy는 분석에만 필요하므로 이 API가 처음 호출될 때 불러온다.
+    try:
+        from survey_analytics import SurveyAnalytics
+    except ImportError as e:
+        logger.error(f"설문조사 분석 모듈을 불러오지 못했습니다: {e}")
+        return jsonify({'error': '설문조사 분석에 필요한 numpy가 설치되어 있지 않습니다. (venv/bin/pip install numpy)'}), 503
+
+    with _survey_analytics_lock:
+        if _survey_analytics is None:
+            _survey_analytics = run_blocking(SurveyAnalytics.load, SURVEY_ANALYTICS_STATE)
+            _survey_analytics_saved_seq = _survey_analytics.checkpoint_seq
+        run_blocking(_survey_analytics.refresh, submission_store)
+        if (_survey_analytics.checkpoint_seq != _survey_analytics_saved_seq
+                and time.monotonic() - _survey_analytics_saved_at >= SURVEY_ANALYTICS_SAVE_INTERVAL):
+            try:
+                run_blocking(_survey_analytics.save, SURVEY_ANALYTICS_STATE)
+                _survey_analytics_saved_seq = _survey_analytics.checkpoint_seq
+            except OSError as e:
+                logger.error(f"설문조사 분석 상태 저장 실패: {e}")
+            _survey_analytics_saved_at = time.monotonic()
+        summary = _survey_analytics.summary()
+    return jsonify(summary)
+
+
 # --- AI 요약 앱 라우트 ---
 
 @app.route('/')
@@ -242,16 +742,16 @@ def summarizer_home():
 @app.route('/api/summarize', methods=['POST'])
 def generate_standard_summary():
     """[기존] 일반적인 텍스트 요약 API"""
-    if not request.is_json:
-        return jsonify({'error': '요청은 JSON 형식이어야 합니다.'}), 400
-
-    request_data = request.get_json()
-    # 'data' 키를 먼저 확인하고, 그 안에서 'text'를 찾도록 수정
-    data_payload = request_data.get('data', {})
-    text_to_summarize = data_payload.get('text')
+    text_to_summarize, error_response = _get_text_to_summarize()
+    if error_response:
+        return error_response
 
-    if not text_to_summarize or not isinstance(text_to_summarize, str) or not text_to_summarize.strip():
-        return jsonify({'error': '요약할 텍스트(text)는 비어있지 않은 문자열이어야 합니다.'}), 400
+    if estimate_tokens(text_to_summarize) > CHUNK_TOKEN_BUDGET:
+        try:
+            result, timings = _generate_chunked_summary(text_to_summarize)
+            return jsonify({'result': result, 'timings': timings}), 200
+        except ModelResponseError as e:
+            return _model_error_response(e)
 
     return _generate_text_from_model(SUMMARY_PROMPT_TEMPLATE, text_to_summarize, context_log="일반 요약")
 
@@ -260,18 +760,66 @@ def generate_standard_summary():
 @app.route('/api/core-summary', methods=['POST'])
 def generate_core_summary():
     """[신규] 핵심 논증을 요약하는 API"""
-    if not request.is_json:
-        return jsonify({'error': '요청은 JSON 형식이어야 합니다.'}), 400
+    text_to_summarize, error_response = _get_text_to_summarize()
+    if error_response:
+        return error_response
 
-    request_data = request.get_json()
-    # 'data' 키를 먼저 확인하고, 그 안에서 'text'를 찾도록 수정
-    data_payload = request_data.get('data', {})
-    text_to_summarize = data_payload.get('text')
+    return _generate_text_from_model(CORE_SUMMARY_PROMPT_TEMPLATE, text_to_summarize, context_log="핵심 요약")
 
-    if not text_to_summarize or not isinstance(text_to_summarize, str) or not text_to_summarize.strip():
-        return jsonify({'error': '요약할 텍스트(text)는 비어있지 않은 문자열이어야 합니다.'}), 400
 
-    return _generate_text_from_model(CORE_SUMMARY_PROMPT_TEMPLATE, text_to_summarize, context_log="핵심 요약")
+@app.route('/api/summarize/stream', methods=['POST'])
+def stream_standard_summary():
+    """일반 요약 결과를 생성되는 대로 SSE로 보내는 API"""
+    text_to_summarize, error_response = _get_text_to_summarize()
+    if error_response:
+        return error_response
+
+    if estimate_tokens(text_to_summarize) > CHUNK_TOKEN_BUDGET:
+        # 긴 글은 부분 요약까지 먼저 끝내고, 마지막 통합 단계만 스트리밍한다.
+        deadline_at = time.monotonic() + MODEL_REQUEST_DEADLINE
+        summarize_chunk, merge_partials = _chunked_summary_steps(deadline_at)
+        try:
+            partials, timings = map_partials(text_to_summarize, summarize_chunk, merge_partials,
+                                             summary_map_executor, CHUNK_TOKEN_BUDGET, MAX_SUMMARY_CHUNKS)
+        except TooManyChunks as e:
+            return jsonify({'error': str(e)}), 413
+        except ModelResponseError as e:
+            return _model_error_response(e)
+        logger.info(f"분할 요약 부분 단계 완료: {timings}")
+        reduce_template = _reduce_template(count_sentences(text_to_summarize), len(text_to_summarize))
+        merged_input = '\n\n'.join(partials)
+        return _stream_response_from_model(reduce_template.format(text_to_summarize=merged_input),
+                                           context_log="일반 요약(통합)",
+                                           cache_key=response_cache.key(reduce_template, merged_input),
+                                           deadline_at=deadline_at)
+
+    full_prompt = SUMMARY_PROMPT_TEMPLATE.format(text_to_summarize=text_to_summarize)
+    cache_key = response_cache.key(SUMMARY_PROMPT_TEMPLATE, text_to_summarize)
+    return _stream_response_from_model(full_prompt, context_log="일반 요약", cache_key=cache_key)
+
+
+@app.route('/api/core-summary/stream', methods=['POST'])
+def stream_core_summary():
+    """핵심 요약 결과를 생성되는 대로 SSE로 보내는 API"""
+    text_to_summarize, error_response = _get_text_to_summarize()
+    if error_response:
+        return error_response
+
+    full_prompt = CORE_SUMMARY_PROMPT_TEMPLATE.format(text_to_summarize=text_to_summarize)
+    cache_key = response_cache.key(CORE_SUMMARY_PROMPT_TEMPLATE, text_to_summarize)
+    return _stream_response_from_model(full_prompt, context_log="핵심 요약", cache_key=cache_key)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus 텍스트 형식 지표 (모든 워커 합산)"""
+    return Response(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/api/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """AI 응답 캐시 적중/실패 통계 (이 워커 기준)"""
+    return jsonify(response_cache.stats())
 
 # --- 기타 API 라우트 ---
 
@@ -283,16 +831,32 @@ def get_sample_text():
         return jsonify({'error': 'AI 모델을 초기화하는 데 실패했습니다.'}), 500
 
     try:
-        logger.info(f"AI 모델에 샘플 텍스트 생성 요청 전송 중...")
-        response = model.generate_content(SAMPLE_TEXT_GENERATION_PROMPT)
-        logger.info("AI 모델로부터 샘플 텍스트 응답 수신 완료.")
-        return jsonify({'text': response.text.strip()})
+        # 미리 생성해 둔 풀에서 바로 제공하고, 풀이 비었을 때만 직접 생성한다.
+        sample = sample_pool.take(exclude_id=request.cookies.get(SAMPLE_COOKIE))
+        if sample is None:
+            logger.info("샘플 지문 풀이 비어 있어 직접 생성합니다.")
+            return jsonify({'text': _generate_sample_text()})
+        response = jsonify({'text': sample['text']})
+        response.set_cookie(SAMPLE_COOKIE, sample['id'], samesite='Lax')
+        return response
+    except GatewayBusy as e:
+        logger.warning(f"샘플 텍스트 요청 거절: {e}")
+        return _model_error_response(ModelResponseError(str(e), 429, retry_after=e.retry_after))
+    except GatewayTimeout as e:
+        logger.error(f"샘플 텍스트 요청 시간 초과: {e}")
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         logger.error(f"'/api/sample-text' 처리 중 오류 발생: {e}")
         logger.error(traceback.format_exc())
         return jsonify({'error': f'서버 내부 오류가 발생했습니다: {str(e)}'}), 500
 
 
+@app.route('/api/sample-text/stream', methods=['GET'])
+def stream_sample_text():
+    """샘플 텍스트를 생성되는 대로 SSE로 보내는 API"""
+    return _stream_response_from_model(SAMPLE_TEXT_GENERATION_PROMPT, context_log="샘플 텍스트")
+
+
 @app.route('/api/feedback', methods=['POST'])
 def handle_feedback():
     """Yes/No 피드백을 기록하는 API 엔드포인트"""
@@ -305,25 +869,20 @@ def handle_feedback():
         return jsonify({'error': 'Invalid feedback value. Must be "yes" or "no".'}), 400
 
     try:
-        with feedback_lock:
-            try:
-                with open(FEEDBACK_FILE, 'r') as f:
-                    current_counts = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                current_counts = {"yes": 0, "no": 0}
-
-            current_counts[feedback_value] += 1
-
-            with open(FEEDBACK_FILE, 'w') as f:
-                json.dump(current_counts, f, indent=2)
-
-        logger.info(f"Yes/No 피드백 수신: '{feedback_value}'. 현재 카운트: {current_counts}")
+        feedback_counter.increment(feedback_value)
+        logger.info(f"Yes/No 피드백 수신: '{feedback_value}'")
         return jsonify({'message': 'Feedback received successfully'}), 200
     except Exception as e:
         logger.error(f"Yes/No 피드백 처리 오류: {e}")
         return jsonify({'error': 'Server error while processing feedback'}), 500
 
 
+@app.route('/api/feedback', methods=['GET'])
+def get_feedback_counts():
+    """Yes/No 피드백 누적 카운트를 조회하는 API 엔드포인트"""
+    return jsonify(feedback_counter.snapshot())
+
+
 @app.route('/api/star-feedback', methods=['POST'])
 def handle_star_feedback():
     """별점 피드백을 기록하는 API 엔드포인트"""
@@ -336,25 +895,9 @@ def handle_star_feedback():
     if not isinstance(rating, int) or not (1 <= rating <= 5):
         return jsonify({'error': '잘못된 별점 값입니다. 1에서 5 사이의 정수여야 합니다.'}), 400
 
-    rating_key = str(rating)
-
     try:
-        with feedback_lock:
-            try:
-                with open(STAR_FEEDBACK_FILE, 'r') as f:
-                    current_counts = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                current_counts = {str(i): 0 for i in range(1, 6)}
-
-            if rating_key in current_counts:
-                current_counts[rating_key] += 1
-            else:
-                current_counts[rating_key] = 1
-
-            with open(STAR_FEEDBACK_FILE, 'w') as f:
-                json.dump(current_counts, f, indent=2)
-
-        logger.info(f"별점 피드백 수신: {rating}점. 현재 누적: {current_counts}")
+        star_feedback_counter.increment(str(rating))
+        logger.info(f"별점 피드백 수신: {rating}점")
         return jsonify({'message': '별점이 성공적으로 기록되었습니다.'}), 200
 
     except Exception as e:
@@ -363,6 +906,12 @@ def handle_star_feedback():
         return jsonify({'error': '서버에서 별점을 처리하는 중 오류가 발생했습니다.'}), 500
 
 
+@app.route('/api/star-feedback', methods=['GET'])
+def get_star_feedback_counts():
+    """별점 피드백 누적 카운트를 조회하는 API 엔드포인트"""
+    return jsonify(star_feedback_counter.snapshot())
+
+
 # ==============================================================================
 # 4. 앱 실행
 # ==============================================================================
@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""여러 gunicorn 워커에서 모아 Prometheus 형식으로 내보내는 지표
+
+카운터, 게이지, 히스토그램 값은 프로세스 메모리에만 더하고(잠금 하나와 dict 갱신), 백그라운드 스레드가
+write_interval 초마다 바뀐 경우에만 지표 폴더의 <pid>.json 스냅숏으로 쓴다. /metrics 요청을 받은 워커는
+자기 스냅숏을 먼저 쓰고 폴더의 모든 스냅숏을 합쳐 출력한다.
+- 카운터와 히스토그램은 모든 워커의 값을 더한다. 종료된 워커의 값은 _retired.json에 합쳐 두므로 줄지 않는다.
+- 게이지(진행 중인 요청 수 등)는 살아 있는 워커의 값만 더한다.
+"""
+import atexit
+import bisect
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from blocking_io import run_blocking
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CHARS_BUCKETS = (100, 300, 1000, 3000, 10000, 30000, 100000)
+TOKENS_BUCKETS = (50, 100, 300, 1000, 3000, 10000, 30000)
+
+_RETIRED_FILE = '_retired.json'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # 레이블 값 튜플 -> 값
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"지표 '{self.name}'의 레이블은 {self.labelnames}입니다: {labels}")
+        return tuple(str(label) for label in labels)
+
+    def _reset(self):
+        with self._lock:
+            self._values = {}
+
+    def _samples(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._registry._dirty = True
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._registry._dirty = True
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track(self, *labels):
+        """with 블록이 실행되는 동안 1 증가"""
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # 구간별 개수(마지막 칸은 +Inf), 합계
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+        self._registry._dirty = True
+
+    @contextmanager
+    def time(self, *labels):
+        """with 블록의 실행 시간(초)을 기록"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def _samples(self):
+        with self._lock:
+            return [[list(key), [list(counts), total]] for key, (counts, total) in self._values.items()]
+
+
+class MetricsRegistry:
+    """이 프로세스의 지표 목록과 워커 간 스냅숏 공유"""
+
+    def __init__(self, write_interval=2.0):
+        self.write_interval = write_interval
+        self.directory = None
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._owner_pid = os.getpid()
+        self._writer_pid = None
+
+    # --- 지표 정의 ---
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"지표 '{name}'이(가) 다른 종류나 레이블로 이미 정의되어 있습니다.")
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    # --- 스냅숏 쓰기 ---
+
+    def start(self, directory):
+        """이 프로세스의 스냅숏 기록 스레드 시작 (fork된 워커마다 한 번, 이후 호출은 바로 반환)"""
+        if self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            if self._owner_pid != os.getpid():
+                # fork 전에 부모가 기록한 값은 부모 몫이다.
+                for metric in list(self._metrics.values()):
+                    metric._reset()
+                self._owner_pid = os.getpid()
+            self.directory = directory
+            self._writer_pid = os.getpid()
+        os.makedirs(directory, exist_ok=True)
+        threading.Thread(target=self._run_writer, name='metrics-writer', daemon=True).start()
+        atexit.register(self.write)
+
+    def _run_writer(self):
+        while True:
+            time.sleep(self.write_interval)
+            if self._dirty:
+                self.write()
+
+    def _snapshot(self):
+        return {name: metric._samples() for name, metric in list(self._metrics.items())}
+
+    def write(self):
+        if self.directory is None or self._owner_pid != os.getpid():
+            return
+        self._dirty = False
+        try:
+            run_blocking(self._write, self._snapshot())
+        except OSError as e:
+            logger.error(f"지표 스냅숏 기록 실패: {e}")
+
+    def _write(self, snapshot):
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='UTF-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    # --- 합산 / 출력 ---
+
+    def collect(self):
+        """모든 워커의 스냅숏을 합친 {지표 이름: {레이블 값 튜플: 값}}"""
+        self.write()
+        if self.directory is None:
+            return self._merge({}, [(self._snapshot(), True)])
+        return run_blocking(self._collect)
+
+    def _collect(self):
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                retired_path = os.path.join(self.directory, _RETIRED_FILE)
+                retired = self._load(self._read(retired_path) or {})
+                live, dead_paths = [], []
+                for entry in os.scandir(self.directory):
+                    if not entry.name.endswith('.json') or entry.name == _RETIRED_FILE:
+                        continue
+                    snapshot = self._read(entry.path)
+                    if snapshot is None:
+                        continue
+                    if _pid_alive(entry.name[:-5]):
+                        live.append((snapshot, True))
+                    else:
+                        dead_paths.append(entry.path)
+                        self._merge(retired, [(snapshot, False)])
+                if dead_paths:
+                    # 종료된 워커의 카운터/히스토그램은 _retired.json으로 옮긴다.
+                    tmp_path = retired_path + '.tmp'
+                    with open(tmp_path, 'w', encoding='UTF-8') as f:
+                        json.dump(self._dump(retired), f, ensure_ascii=False)
+                    os.replace(tmp_path, retired_path)
+                    for path in dead_paths:
+                        os.unlink(path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return self._merge(retired, live)
+
+    def _read(self, path):
+        try:
+            with open(path, 'r', encoding='UTF-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"지표 스냅숏 '{path}' 읽기 오류: {e}")
+            return None
+
+    def _load(self, snapshot):
+        return {name: {tuple(labels): value for labels, value in samples} for name, samples in snapshot.items()}
+
+    def _dump(self, merged):
+        return {name: [[list(labels), value] for labels, value in values.items()] for name, values in merged.items()}
+
+    def _merge(self, merged, snapshots):
+        """snapshots [(스냅숏, 살아 있는 워커 여부)]를 merged에 더한다. 게이지는 살아 있는 워커 것만 더한다."""
+        for snapshot, alive in snapshots:
+            for name, samples in snapshot.items():
+                metric = self._metrics.get(name)
+                if metric is None or (metric.kind == 'gauge' and not alive):
+                    continue
+                values = merged.setdefault(name, {})
+                for labels, value in samples:
+                    key = tuple(labels)
+                    current = values.get(key)
+                    if current is None:
+                        values[key] = value if metric.kind != 'histogram' else [list(value[0]), value[1]]
+                    elif metric.kind == 'histogram':
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                    else:
+                        values[key] = current + value
+        return merged
+
+    def render(self):
+        """Prometheus 텍스트 형식(0.0.4)"""
+        merged = self.collect()
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f'# HELP {name} {_escape_help(metric.documentation)}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key, value in sorted(merged.get(name, {}).items()):
+                labels = list(zip(metric.labelnames, key))
+                if metric.kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels + [("le", _format_value(bound))])} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(name):
+    try:
+        os.kill(int(name), 0)
+    except ValueError:
+        return False
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape_help(text):
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# 기본 레지스트리와 여러 모듈이 함께 쓰는 지표
+REGISTRY = MetricsRegistry()
+
+FILE_IO_SECONDS = REGISTRY.histogram('app_file_io_duration_seconds',
+                                     '설문조사/피드백 저장소의 파일·DB 작업 시간(초)', ('operation', 'target'))
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""AI 모델 백엔드
+
+main.py는 model.generate_content(prompt, stream=False)만 사용하므로, 같은 모양의 객체라면
+Gemini 대신 끼워 넣을 수 있다. 백엔드는 환경 변수 MODEL_BACKEND로 고른다.
+- gemini (기본값): google.generativeai. 이 백엔드를 고를 때만 패키지를 불러오고 API 키를 설정한다.
+- fake: API 키 없이 로컬에서 시험하거나 부하 테스트(bench/loadtest.py)를 할 때 쓰는 FakeModel
+
+FakeModel의 동작은 다음 환경 변수로 조절한다. 차단과 오류 여부는 시드, 프롬프트, 그 프롬프트의 몇 번째
+호출인지로 결정되므로 같은 순서로 요청하면 같은 결과가 나온다.
+    FAKE_MODEL_LATENCY_MS      첫 조각까지의 지연 (기본 0)
+    FAKE_MODEL_CHUNKS          응답 조각(문장) 수 (기본 5)
+    FAKE_MODEL_CHUNK_DELAY_MS  조각 사이 지연 (기본 50)
+    FAKE_MODEL_BLOCK_RATE      호출마다 안전 필터로 차단될 확률 0~1 (기본 0)
+    FAKE_MODEL_BLOCK_REASON    차단 이유 (기본 SAFETY)
+    FAKE_MODEL_ERROR_RATE      호출마다 일시적 오류(FakeTransientError)가 날 확률 0~1 (기본 0)
+    FAKE_MODEL_SEED            결정적 난수의 시드 (기본 0)
+"""
+import hashlib
+import os
+import threading
+import time
+
+from chunked_summary import estimate_tokens
+
+MODEL_BACKENDS = ('gemini', 'fake')
+
+
+def create_model(backend, model_name, api_key=None, transport=None):
+    """backend 이름에 맞는 모델 객체 생성 (설정이 잘못되었으면 ValueError)"""
+    if backend == 'fake':
+        return FakeModel.from_env()
+    if backend == 'gemini':
+        if not api_key or api_key == "YOUR_API_KEY_HERE":
+            raise ValueError("API 키가 제공되지 않았습니다. 환경 변수(GEMINI_API_KEY) 또는 코드 내(API_KEY_PROVIDED)에 키를 설정해주세요.")
+        import google.generativeai as genai
+        genai.configure(api_key=api_key, transport=transport)
+        return genai.GenerativeModel(model_name=model_name)
+    raise ValueError(f"알 수 없는 모델 백엔드입니다: {backend} (가능한 값: {', '.join(MODEL_BACKENDS)})")
+
+
+class FakeTransientError(ConnectionError):
+    """FakeModel이 흉내 내는 일시적 오류 (게이트웨이가 재시도한다)"""
+
+
+class FakePromptFeedback:
+    def __init__(self, block_reason=None):
+        self.block_reason = block_reason
+
+
+class FakeUsageMetadata:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    """google.generativeai의 GenerateContentResponse와 같은 속성만 흉내 낸 응답"""
+
+    def __init__(self, chunks, block_reason=None, delay=0.0, usage_metadata=None):
+        self._chunks = chunks
+        self._delay = delay
+        self.prompt_feedback = FakePromptFeedback(block_reason)
+        self.usage_metadata = usage_metadata
+
+    @property
+    def text(self):
+        return ''.join(self._chunks)
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if self._delay:
+                time.sleep(self._delay)
+            yield FakeResponse([chunk], self.prompt_feedback.block_reason)
+
+
+class FakeModel:
+    """프롬프트 해시로 결정되는 가짜 응답을 chunk_count개 조각으로 나누어 돌려주는 모델"""
+
+    def __init__(self, chunk_count=5, chunk_delay=0.05, latency=0.0, block_rate=0.0,
+                 block_reason='SAFETY', error_rate=0.0, seed=0):
+        self.chunk_count = chunk_count
+        self.chunk_delay = chunk_delay
+        self.latency = latency
+        self.block_rate = block_rate
+        self.block_reason = block_reason
+        self.error_rate = error_rate
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._attempts = {}  # 프롬프트 해시 -> 지금까지의 호출 횟수
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        return cls(chunk_count=int(environ.get('FAKE_MODEL_CHUNKS', 5)),
+                   chunk_delay=float(environ.get('FAKE_MODEL_CHUNK_DELAY_MS', 50)) / 1000,
+                   latency=float(environ.get('FAKE_MODEL_LATENCY_MS', 0)) / 1000,
+                   block_rate=float(environ.get('FAKE_MODEL_BLOCK_RATE', 0)),
+                   block_reason=environ.get('FAKE_MODEL_BLOCK_REASON', 'SAFETY'),
+                   error_rate=float(environ.get('FAKE_MODEL_ERROR_RATE', 0)),
+                   seed=int(environ.get('FAKE_MODEL_SEED', 0)))
+
+    def _roll(self, *parts):
+        """seed와 parts로 결정되는 [0, 1) 사이의 값"""
+        digest = hashlib.sha256('\0'.join(str(part) for part in (self.seed,) + parts).encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+    def _next_attempt(self, digest):
+        with self._lock:
+            if len(self._attempts) > 10000:
+                self._attempts.clear()
+            attempt = self._attempts[digest] = self._attempts.get(digest, 0) + 1
+        return attempt
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]
+        attempt = self._next_attempt(digest)
+        if self.error_rate and self._roll('error', digest, attempt) < self.error_rate:
+            time.sleep(self.latency)
+            raise FakeTransientError(f"가짜 모델 일시적 오류 ({digest})")
+
+        usage = None
+        if self.block_rate and self._roll('block', digest, attempt) < self.block_rate:
+            chunks, block_reason = [], self.block_reason
+        else:
+            chunks = [f"가짜 응답 {digest}의 {i + 1}번째 문장입니다. " for i in range(self.chunk_count)]
+            block_reason = None
+            usage = FakeUsageMetadata(estimate_tokens(prompt), estimate_tokens(''.join(chunks)))
+
+        if self.latency:
+            time.sleep(self.latency)
+        if stream:
+            return FakeResponse(chunks, block_reason, delay=self.chunk_delay, usage_metadata=usage)
+        time.sleep(self.chunk_delay * len(chunks))
+        return FakeResponse(chunks, block_reason, usage_metadata=usage)
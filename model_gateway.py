@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""모든 AI 모델 호출이 거쳐 가는 게이트웨이
+
+- 분당 요청 수 / 분당 토큰 수 토큰 버킷
+- 동시 호출 수 제한과 크기가 정해진 대기열 (가득 차면 GatewayBusy로 바로 거절 → 429 + Retry-After)
+- 워커 간 슬롯(ProcessSlots): 모델 호출을 진행할 수 있는 워커 프로세스 수 제한 (빈 슬롯이 없으면 바로 429)
+- 속도 제한 대기가 max_rate_wait보다 길어지면 기다리지 않고 거절
+- 일시적 오류(429/500/503/504, 연결 오류)는 지터를 넣은 지수 백오프로 재시도
+- 요청마다 마감 시간(deadline): 대기, 재시도, 모델 호출 시간 모두 이 안에서 끝나고, 넘기면 GatewayTimeout
+
+토큰 버킷과 대기열은 프로세스마다 적용되므로, 전체 한도를 워커 수(WEB_CONCURRENCY)로 나누어 넘긴다.
+"""
+import fcntl
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from chunked_summary import estimate_tokens
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    _GOOGLE_TRANSIENT_ERRORS = (google_exceptions.TooManyRequests, google_exceptions.ResourceExhausted,
+                                google_exceptions.InternalServerError, google_exceptions.ServiceUnavailable,
+                                google_exceptions.DeadlineExceeded)
+except ImportError:
+    _GOOGLE_TRANSIENT_ERRORS = ()
+
+TRANSIENT_ERRORS = _GOOGLE_TRANSIENT_ERRORS + (ConnectionError, TimeoutError)
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayBusy(Exception):
+    """대기열이 가득 찼거나 속도 제한 때문에 마감 시간 안에 처리할 수 없음"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GatewayTimeout(Exception):
+    """요청의 마감 시간이 지남"""
+
+
+class TokenBucket:
+    """분당 rate_per_minute만큼 채워지는 토큰 버킷. 잔량이 음수가 되도록 미리 예약할 수 있다."""
+
+    def __init__(self, rate_per_minute):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount):
+        """amount만큼 예약하고, 실제로 쓸 수 있을 때까지 기다려야 하는 시간(초)을 반환"""
+        with self._lock:
+            self._refill()
+            self._level -= amount
+            return 0.0 if self._level >= 0 else -self._level / self.rate
+
+    def refund(self, amount):
+        with self._lock:
+            self._level = min(self.capacity, self._level + amount)
+
+    def charge(self, amount):
+        """예약 없이 사후에 사용량을 반영 (응답 토큰 등)"""
+        with self._lock:
+            self._level -= amount
+
+
+class ProcessSlots:
+    """워커 프로세스 사이에서 공유하는 count개의 슬롯 (잠금 파일마다 fcntl.flock 하나)
+
+    한 프로세스는 슬롯을 최대 하나만 잡고, 같은 프로세스의 동시 호출(부분 요약 스레드, 샘플 생성 스레드)은
+    그 슬롯을 함께 쓴다. 워커가 죽으면 운영체제가 잠금을 풀어 준다.
+    """
+
+    def __init__(self, lock_dir, count):
+        self.lock_dir = lock_dir
+        self.count = count
+        self._lock = threading.Lock()
+        self._file = None
+        self._holders = 0
+        self._pid = None
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def try_acquire(self):
+        """빈 슬롯을 잡으면 True, 모든 슬롯이 다른 워커에 잡혀 있으면 기다리지 않고 False"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # fork된 워커는 부모의 잠금을 물려받지 않은 것으로 본다.
+                self._pid, self._file, self._holders = os.getpid(), None, 0
+            if self._holders:
+                self._holders += 1
+                return True
+            for index in range(self.count):
+                lock_file = open(os.path.join(self.lock_dir, f'slot-{index}.lock'), 'a')
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    lock_file.close()
+                    continue
+                self._file, self._holders = lock_file, 1
+                return True
+            return False
+
+    def release(self):
+        with self._lock:
+            self._holders -= 1
+            if self._holders == 0:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+                self._file.close()
+                self._file = None
+
+
+class ModelGateway:
+    """속도 제한, 동시성 제한, 재시도, 마감 시간을 적용해 모델을 호출한다."""
+
+    def __init__(self, get_model, requests_per_minute, tokens_per_minute, max_concurrency, max_queue,
+                 deadline=60.0, max_retries=3, backoff_base=0.5, backoff_max=8.0, process_slots=None,
+                 max_rate_wait=None):
+        self.get_model = get_model  # 호출 시점의 모델 객체를 돌려주는 함수 (모델 교체 대응)
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.process_slots = process_slots  # ProcessSlots (None이면 워커 간 제한 없음)
+        self.max_rate_wait = max_rate_wait  # 속도 제한 때문에 기다릴 수 있는 최대 시간(초, None이면 마감 시간까지)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._admitted = 0  # 실행 중 + 대기 중
+
+    @contextmanager
+    def admit(self, deadline=None, deadline_at=None):
+        """동시 실행 슬롯 하나를 차지한다. 마감 시각(time.monotonic 기준)을 돌려준다.
+
+        여러 번의 호출로 이루어진 요청(분할 요약 등)은 요청 전체의 마감 시각 deadline_at을 넘겨 함께 쓴다.
+        """
+        if deadline_at is None:
+            deadline_at = time.monotonic() + (deadline or self.deadline)
+        with self.hold_worker():
+            with self._lock:
+                if self._admitted >= self.max_concurrency + self.max_queue:
+                    raise GatewayBusy('AI 요청이 너무 많습니다. 잠시 후 다시 시도해주세요.', retry_after=self._retry_hint())
+                self._admitted += 1
+            try:
+                if not self._slots.acquire(timeout=max(0.0, deadline_at - time.monotonic())):
+                    raise GatewayBusy('AI 요청 대기 시간이 초과되었습니다. 잠시 후 다시 시도해주세요.',
+                                      retry_after=self._retry_hint())
+                try:
+                    yield deadline_at
+                finally:
+                    self._slots.release()
+            finally:
+                with self._lock:
+                    self._admitted -= 1
+
+    @contextmanager
+    def hold_worker(self):
+        """워커 간 슬롯 하나를 차지한다 (빈 슬롯이 없으면 GatewayBusy).
+
+        admit()이 직접 쓰고, 다른 워커의 모델 호출을 기다리기만 하는 요청(single-flight follower)도 쓴다.
+        같은 프로세스 안에서는 슬롯을 함께 쓰므로 겹쳐서 불러도 된다.
+        """
+        if self.process_slots is None:
+            yield
+            return
+        if not self.process_slots.try_acquire():
+            raise GatewayBusy('AI 요청이 너무 많습니다. 잠시 후 다시 시도해주세요.', retry_after=self._retry_hint())
+        try:
+            yield
+        finally:
+            self.process_slots.release()
+
+    def _retry_hint(self):
+        return max(1, round(self.deadline / 10))
+
+    def _wait_for_rate(self, prompt, deadline_at):
+        tokens = estimate_tokens(prompt)
+        wait = max(self.request_bucket.reserve(1), self.token_bucket.reserve(tokens))
+        too_long = self.max_rate_wait is not None and wait > self.max_rate_wait
+        if too_long or time.monotonic() + wait > deadline_at:
+            self.request_bucket.refund(1)
+            self.token_bucket.refund(tokens)
+            raise GatewayBusy('AI 요청 한도를 초과했습니다. 잠시 후 다시 시도해주세요.', retry_after=max(1, round(wait)))
+        if wait:
+            time.sleep(wait)
+
+    def call(self, prompt, deadline_at, stream=False):
+        """admit()으로 얻은 마감 시각 안에서 모델을 호출 (일시적 오류는 재시도)"""
+        model = self.get_model()
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise GatewayTimeout('AI 모델 응답 마감 시간이 지났습니다.')
+            self._wait_for_rate(prompt, deadline_at)
+            try:
+                response = model.generate_content(prompt, stream=stream,
+                                                  request_options={'timeout': deadline_at - time.monotonic()})
+                if not stream:
+                    usage = getattr(response, 'usage_metadata', None)
+                    if usage is not None and getattr(usage, 'candidates_token_count', None):
+                        self.token_bucket.charge(usage.candidates_token_count)
+                return response
+            except TRANSIENT_ERRORS as e:
+                attempt += 1
+                backoff = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+                if time.monotonic() + backoff >= deadline_at:
+                    # 마감 시간 때문에 더 재시도할 수 없음 (마감에 걸린 상위 타임아웃 포함)
+                    raise GatewayTimeout('AI 모델 응답 마감 시간이 지났습니다.') from e
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(f"AI 모델 일시적 오류로 {backoff:.2f}초 후 재시도 ({attempt}/{self.max_retries}): {e}")
+                time.sleep(backoff)
+
+    def generate(self, prompt, deadline=None, deadline_at=None):
+        """슬롯 확보부터 응답 수신까지 한 번에 처리 (스트리밍이 아닌 호출용)"""
+        with self.admit(deadline, deadline_at) as deadline_at:
+            return self.call(prompt, deadline_at)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""설문조사 지문(json 폴더)을 메모리에 올려 두고 슬롯 번호로 색인하는 카탈로그"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _Snapshot:
+    """한 시점의 카탈로그 상태. 만들어진 뒤에는 바뀌지 않으므로 잠금 없이 읽는다."""
+
+    def __init__(self, passages):
+        self.passages = passages
+        # 슬롯 번호 -> 지문 (진행 상황 비트셋의 비트 위치)
+        self.by_slot = {passage['_slot']: passage for passage in passages}
+
+
+class PassageCatalog:
+    """json 폴더의 지문을 한 번만 파싱해 두고, 슬롯 번호로 바로 찾아준다.
+
+    폴더는 reload_interval 초마다 stat으로만 확인하며, 수정된 파일만 다시 읽는다.
+    형식이 잘못된 파일은 한 번만 로그를 남기고 파일이 바뀔 때까지 건너뛴다.
+
+    각 지문에는 파일 이름 기준으로 고정된 슬롯 번호가 부여되며, slot_file에 기록되어
+    파일이 추가/삭제되어도, 여러 워커 사이에서도 같은 번호가 유지된다.
+    """
+
+    def __init__(self, folder, slot_file=None, reload_interval=2.0):
+        self.folder = folder
+        self.slot_file = slot_file or os.path.join(folder, '.slots')
+        self.reload_interval = reload_interval
+        self._reload_lock = threading.Lock()
+        self._files = {}  # 파일 이름 -> ((mtime_ns, size), 지문 dict 또는 None)
+        self._last_check = 0.0
+        self._snapshot = _Snapshot([])
+        self._max_slot = -1  # 지금까지 부여된 가장 큰 슬롯 번호 (삭제된 지문 포함)
+        self.version = 0  # 스냅샷이 바뀔 때마다 증가
+        self.reload()
+
+    # --- 로딩 ---
+
+    def _load_file(self, file_path):
+        try:
+            with open(file_path, 'r', encoding='UTF-8') as json_file:
+                data = json.load(json_file)
+            data['_mask'] = int(data['id'], 2)
+            data['_key'] = os.path.splitext(os.path.basename(file_path))[0]
+            return data
+        except (IOError, json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            logger.error(f"파일 '{file_path}' 처리 중 오류 발생 (수정될 때까지 건너뜁니다): {e}")
+            return None
+
+    def _assign_slots(self, keys):
+        """지문 키에 슬롯 번호를 부여한다. 기존 번호는 절대 바꾸지 않고 새 키만 뒤에 추가한다."""
+        with open(self.slot_file, 'a+', encoding='UTF-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            content = f.read()
+            slots = json.loads(content) if content.strip() else {}
+            missing = [key for key in keys if key not in slots]
+            if missing:
+                next_slot = max(slots.values(), default=-1) + 1
+                for key in missing:
+                    slots[key] = next_slot
+                    next_slot += 1
+                f.seek(0)
+                f.truncate()
+                json.dump(slots, f, ensure_ascii=False, indent=2)
+            return slots
+
+    def reload(self):
+        """폴더를 다시 확인해 추가/수정/삭제된 파일만 반영한다."""
+        with self._reload_lock:
+            self._reload_locked()
+
+    def _reload_locked(self):
+        self._last_check = time.monotonic()
+        try:
+            entries = [e for e in os.scandir(self.folder) if e.name.endswith('.json') and e.is_file()]
+        except OSError as e:
+            logger.error(f"지문 폴더 '{self.folder}'를 읽는 중 오류 발생: {e}")
+            return
+
+        changed = False
+        files = {}
+        for entry in entries:
+            stat = entry.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+            cached = self._files.get(entry.name)
+            if cached is not None and cached[0] == signature:
+                files[entry.name] = cached
+                continue
+            files[entry.name] = (signature, self._load_file(entry.path))
+            changed = True
+
+        if changed or files.keys() != self._files.keys():
+            self._files = files
+            passages = [passage for _, passage in (files[name] for name in sorted(files)) if passage is not None]
+            slots = self._assign_slots([passage['_key'] for passage in passages])
+            for passage in passages:
+                passage['_slot'] = slots[passage['_key']]
+            self._max_slot = max(slots.values(), default=-1)
+            self._snapshot = _Snapshot(passages)
+            self.version += 1
+            logger.info(f"지문 카탈로그 갱신: {len(passages)}개 지문 로드됨.")
+
+    def _maybe_reload(self):
+        if time.monotonic() - self._last_check < self.reload_interval:
+            return
+        # 다른 스레드가 이미 확인 중이면 기존 스냅샷으로 바로 응답한다.
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._reload_locked()
+        finally:
+            self._reload_lock.release()
+
+    # --- 조회 ---
+
+    def passages(self):
+        """현재 로드된 모든 지문 목록"""
+        self._maybe_reload()
+        return self._snapshot.passages
+
+    def by_slot(self, slot):
+        """슬롯 번호에 해당하는 지문 (없으면 None)"""
+        self._maybe_reload()
+        return self._snapshot.by_slot.get(slot)
+
+    def conflict_mask(self, slots):
+        """완료한 슬롯들의 id 비트마스크를 모두 합친 값"""
+        by_slot = self._snapshot.by_slot
+        mask = 0
+        for slot in slots:
+            passage = by_slot.get(slot)
+            if passage is not None:
+                mask |= passage['_mask']
+        return mask
+
+    def max_slot(self):
+        """지금까지 부여된 가장 큰 슬롯 번호 (진행 상황 토큰 길이 검증용, 지문이 없으면 -1)"""
+        self._maybe_reload()
+        return self._max_slot
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""AI 모델 응답 캐시 (프로세스 내 LRU + 워커 간 공유 SQLite 디스크 캐시)
+
+키는 네임스페이스(모델 이름과 프롬프트 템플릿의 해시), 템플릿, 정규화된 입력 텍스트의 SHA-256이다.
+모델이나 템플릿이 바뀌면 네임스페이스가 달라지므로 이전 항목은 조회되지 않고 시작 시 삭제된다.
+
+명령행 사용법:
+    python response_cache.py stats
+    python response_cache.py clear
+"""
+import argparse
+import hashlib
+import logging
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from blocking_io import run_blocking
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = 'response_cache.db'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+'''
+
+
+def make_namespace(*parts):
+    """모델 이름, 프롬프트 템플릿 등 캐시 내용을 좌우하는 값들로 네임스페이스 생성"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+def normalize_text(text):
+    """공백/유니코드 정규화 (줄바꿈·들여쓰기 차이만 있는 같은 글은 같은 키가 되도록)"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+class ResponseCache:
+    """2단계 응답 캐시"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, namespace='', ttl=7 * 24 * 3600,
+                 max_memory_entries=256, max_disk_entries=5000):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # 키 -> (값, 만료 시각)
+        self._local = threading.local()
+        self._puts = 0
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0}
+        conn = self._conn()
+        with conn:
+            conn.executescript(_SCHEMA)
+            deleted = conn.execute('DELETE FROM responses WHERE namespace != ? OR expires_at < ?',
+                                   (namespace, time.time())).rowcount
+        if deleted:
+            logger.info(f"응답 캐시에서 만료되었거나 모델/템플릿이 바뀐 항목 {deleted}개를 삭제했습니다.")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.path)
+        return conn
+
+    def key(self, prompt_template, text):
+        digest = hashlib.sha256()
+        for part in (self.namespace, prompt_template, normalize_text(text)):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    # --- 조회 / 저장 ---
+
+    def get(self, key, count=True):
+        """캐시된 응답 (없거나 만료되었으면 None)
+
+        count=False이면 적중/실패 통계에 넣지 않는다 (같은 요청 안에서 다시 확인할 때).
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    if count:
+                        self._stats['memory_hits'] += 1
+                    return entry[0]
+                del self._memory[key]
+
+        row = run_blocking(self._disk_get, key, now)
+        with self._lock:
+            if row is None:
+                if count:
+                    self._stats['misses'] += 1
+                return None
+            if count:
+                self._stats['disk_hits'] += 1
+            self._remember(key, row[0], row[1])
+        return row[0]
+
+    def _disk_get(self, key, now):
+        try:
+            conn = self._conn()
+            row = conn.execute('SELECT value, expires_at FROM responses WHERE key = ? AND namespace = ? '
+                               'AND expires_at > ?', (key, self.namespace, now)).fetchone()
+            if row is not None:
+                with conn:
+                    conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+            return row
+        except sqlite3.Error as e:
+            logger.error(f"응답 캐시 조회 중 오류 발생: {e}")
+            return None
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._stats['stores'] += 1
+            self._puts += 1
+            evict = self._puts % 100 == 0
+        run_blocking(self._disk_put, key, value, expires_at, now, evict)
+
+    def _disk_put(self, key, value, expires_at, now, evict):
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO responses (key, namespace, value, expires_at, last_access) '
+                             'VALUES (?, ?, ?, ?, ?)', (key, self.namespace, value, expires_at, now))
+            if evict:
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.error(f"응답 캐시 저장 중 오류 발생: {e}")
+
+    def _evict(self, conn, now):
+        """만료된 항목과, 최대 개수를 넘는 가장 오래 사용되지 않은 항목 삭제"""
+        with conn:
+            conn.execute('DELETE FROM responses WHERE expires_at < ?', (now,))
+            conn.execute('DELETE FROM responses WHERE key IN (SELECT key FROM responses '
+                         'ORDER BY last_access DESC LIMIT -1 OFFSET ?)', (self.max_disk_entries,))
+
+    def clear(self):
+        """모든 캐시 항목 삭제 (모든 워커의 디스크 캐시 포함, 다른 워커의 메모리 캐시는 제외)"""
+        with self._lock:
+            self._memory.clear()
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM responses')
+
+    def stats(self):
+        """이 프로세스의 적중/실패 통계와 디스크 캐시 항목 수"""
+        with self._lock:
+            stats = dict(self._stats, memory_entries=len(self._memory))
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 4) if lookups else 0.0
+        try:
+            stats['disk_entries'] = self._conn().execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        except sqlite3.Error:
+            stats['disk_entries'] = None
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='AI 응답 캐시 도구')
+    parser.add_argument('--db', default=DEFAULT_CACHE_PATH, help='캐시 SQLite 경로')
+    parser.add_argument('command', choices=['stats', 'clear'])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    conn = _connect(args.db)
+    conn.executescript(_SCHEMA)
+    if args.command == 'clear':
+        with conn:
+            deleted = conn.execute('DELETE FROM responses').rowcount
+        logger.info(f"응답 캐시 항목 {deleted}개를 삭제했습니다.")
+    else:
+        count, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM responses').fetchone()
+        logger.info(f"응답 캐시 항목 {count}개, 총 {size}자")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
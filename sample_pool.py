@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""미리 생성해 둔 샘플 지문 풀
+
+지문은 폴더에 하나씩 JSON 파일로 저장되므로 서버를 재시작해도 유지되고, 모든 워커가 공유한다.
+풀 변경은 잠금 파일(fcntl.flock)로 직렬화하며, 생성 스레드는 워커마다 하나씩 있지만 생산자 잠금을
+얻은 하나만 실제로 모델을 호출한다. 지문은 max_uses번 제공되면 풀에서 빠지고, 남은 지문이
+low_water 미만이 되면 capacity까지 다시 채운다.
+"""
+import fcntl
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from blocking_io import run_blocking
+
+logger = logging.getLogger(__name__)
+
+
+class SamplePool:
+    """샘플 지문 풀"""
+
+    def __init__(self, folder, generate_fn, capacity=20, low_water=5, max_uses=3,
+                 check_interval=5.0, error_backoff=30.0):
+        self.folder = folder
+        self.generate_fn = generate_fn  # 인자 없이 호출하면 새 지문 텍스트를 반환 (실패 시 예외)
+        self.capacity = capacity
+        self.low_water = low_water
+        self.max_uses = max_uses
+        self.check_interval = check_interval
+        self.error_backoff = error_backoff
+        self._lock_path = os.path.join(folder, '.pool.lock')
+        self._producer_lock_path = os.path.join(folder, '.producer.lock')
+        self._wakeup = threading.Event()
+        self._producer_pid = None
+        os.makedirs(folder, exist_ok=True)
+
+    @contextmanager
+    def _pool_lock(self):
+        with open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _entry_paths(self):
+        return [entry.path for entry in os.scandir(self.folder) if entry.name.endswith('.json')]
+
+    def _read(self, path):
+        try:
+            with open(path, 'r', encoding='UTF-8') as f:
+                return json.load(f)
+        except (IOError, json.JSONDecodeError) as e:
+            logger.error(f"샘플 지문 '{path}' 읽기 오류 (삭제합니다): {e}")
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+
+    def _write(self, path, entry):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='UTF-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def size(self):
+        return len(self._entry_paths())
+
+    # --- 제공 ---
+
+    def take(self, exclude_id=None):
+        """풀에서 지문 하나를 꺼낸다 ({'id', 'text'}). exclude_id와 다른 지문을 우선하며, 풀이 비었으면 None."""
+        self.start()
+        entry, remaining = run_blocking(self._take, exclude_id)
+        if remaining < self.low_water:
+            self._wakeup.set()
+        if entry is None:
+            return None
+        return {'id': entry['id'], 'text': entry['text']}
+
+    def _take(self, exclude_id):
+        with self._pool_lock():
+            paths = self._entry_paths()
+            candidates = [path for path in paths if os.path.basename(path)[:-5] != exclude_id] or paths
+            entry = None
+            while candidates and entry is None:
+                path = random.choice(candidates)
+                candidates.remove(path)
+                entry = self._read(path)
+            if entry is None:
+                remaining = 0
+            else:
+                entry['uses'] = entry.get('uses', 0) + 1
+                if entry['uses'] >= self.max_uses:
+                    os.unlink(path)
+                    remaining = len(paths) - 1
+                else:
+                    self._write(path, entry)
+                    remaining = len(paths)
+        return entry, remaining
+
+    # --- 생성 ---
+
+    def _add(self, entry):
+        with self._pool_lock():
+            self._write(os.path.join(self.folder, f"{entry['id']}.json"), entry)
+
+    def start(self):
+        """이 프로세스의 생성 스레드 시작 (fork된 워커마다 한 번)"""
+        if self._producer_pid == os.getpid():
+            return
+        self._producer_pid = os.getpid()
+        threading.Thread(target=self._run_producer, name='sample-pool-producer', daemon=True).start()
+
+    def _run_producer(self):
+        with open(self._producer_lock_path, 'a') as lock_file:
+            # 생산자 잠금을 가진 워커가 종료되면 다른 워커의 스레드가 이어받는다.
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    time.sleep(self.check_interval)
+            while True:
+                if self.size() < self.low_water:
+                    self._refill()
+                self._wakeup.wait(self.check_interval)
+                self._wakeup.clear()
+
+    def _refill(self):
+        logger.info(f"샘플 지문 풀 보충 시작 (현재 {self.size()}개, 목표 {self.capacity}개)")
+        while self.size() < self.capacity:
+            try:
+                text = self.generate_fn()
+            except Exception as e:
+                logger.error(f"샘플 지문 생성 중 오류 발생: {e}")
+                time.sleep(self.error_backoff)
+                return
+            entry_id = uuid.uuid4().hex[:12]
+            run_blocking(self._add, {'id': entry_id, 'text': text, 'created': time.time(), 'uses': 0})
+        logger.info(f"샘플 지문 풀 보충 완료 ({self.size()}개)")
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""같은 키의 동시 요청을 하나의 실제 호출로 합치는 single-flight
+
+프로세스 안에서는 먼저 온 요청(leader)만 함수를 실행하고, 나머지(follower)는 그 결과나 예외를 그대로 받는다.
+워커 프로세스 사이에서는 키별 잠금 파일(fcntl.flock)로 leader를 하나로 제한한다. 다른 워커의 leader를
+기다린 follower는 잠금을 얻은 뒤 함수를 실행하는데, 이때 함수가 캐시를 다시 확인하면 추가 호출 없이 끝난다.
+다른 워커의 leader가 실패했다면 그 오류가 .err 파일로 남아 있으므로 같은 오류를 다시 발생시킨다.
+다른 워커의 leader를 기다리는 동안에는 wait_guard()를 잡고 있는다. (모델 호출처럼 워커를 차지하는 대기를
+호출자의 동시 실행 제한에 포함시키는 데 쓴다. wait_guard()가 예외를 내면 기다리지 않고 그 예외를 그대로 낸다.)
+
+잠금은 블로킹 flock 대신 LOCK_NB로 조금씩 간격을 늘려 가며 다시 시도한다. gevent 워커에서는 time.sleep이
+협력적으로 바뀌므로, 오래 기다리는 follower가 허브의 스레드 풀(run_blocking)을 차지하지 않는다.
+기다린 시간이 wait_timeout을 넘으면 error_factory(..., 504)로 실패한다.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import ExitStack, nullcontext
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _runtime_error(message, status_code=500, retry_after=None):
+    return RuntimeError(message)
+
+
+class SingleFlight:
+    """키별 동시 호출 병합기"""
+
+    POLL_MIN = 0.01  # 잠금 재시도 간격(초), 실패할 때마다 두 배로 늘린다
+    POLL_MAX = 0.2
+
+    def __init__(self, lock_dir, error_factory=_runtime_error, stale_after=600, wait_guard=None, wait_timeout=600):
+        self.lock_dir = lock_dir
+        self.error_factory = error_factory  # error_factory(message, status_code, retry_after=...)로 다른 워커의 오류를 복원
+        self.wait_guard = wait_guard or nullcontext  # 다른 워커의 leader를 기다리는 동안 잡는 컨텍스트 매니저
+        self.wait_timeout = wait_timeout  # 다른 워커의 leader를 기다리는 최대 시간(초)
+        self.stale_after = stale_after  # 이 시간(초) 동안 쓰이지 않은 잠금/오류 파일은 정리
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._last_prune = 0.0
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key, fn, wait_timeout=None):
+        """key에 대한 fn() 결과를 반환. 같은 key로 진행 중인 호출이 있으면 그 결과를 기다린다.
+
+        wait_timeout: 이 호출에서 다른 워커의 leader를 기다리는 최대 시간(초, 없으면 생성할 때 정한 값)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._do_across_processes(key, fn, self.wait_timeout if wait_timeout is None else wait_timeout)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _do_across_processes(self, key, fn, wait_timeout):
+        lock_path = os.path.join(self.lock_dir, f'{key}.lock')
+        error_path = os.path.join(self.lock_dir, f'{key}.err')
+        with open(lock_path, 'a') as lock_file, ExitStack() as guard:
+            waited_since = None
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # 다른 워커가 같은 요청을 처리 중: 끝날 때까지 기다린다.
+                guard.enter_context(self.wait_guard())
+                waited_since = time.time()
+                self._wait_for_lock(lock_file, time.monotonic() + wait_timeout)
+            try:
+                os.utime(lock_path)
+                if waited_since is not None:
+                    self._raise_recent_error(error_path, waited_since)
+                try:
+                    return fn()
+                except Exception as e:
+                    self._record_error(error_path, e)
+                    raise
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                self._maybe_prune()
+
+    def _wait_for_lock(self, lock_file, give_up_at):
+        delay = self.POLL_MIN
+        while True:
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                raise self.error_factory('같은 요청을 처리 중인 다른 워커의 응답을 기다리다 시간이 초과되었습니다.', 504)
+            time.sleep(min(delay, remaining))
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                delay = min(delay * 2, self.POLL_MAX)
+
+    def _raise_recent_error(self, error_path, since):
+        try:
+            with open(error_path, 'r', encoding='UTF-8') as f:
+                error = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if error.get('time', 0) >= since:
+            raise self.error_factory(error['message'], error.get('status_code', 500),
+                                     retry_after=error.get('retry_after'))
+
+    def _record_error(self, error_path, exc):
+        try:
+            with open(error_path, 'w', encoding='UTF-8') as f:
+                json.dump({'time': time.time(), 'message': getattr(exc, 'message', str(exc)),
+                           'status_code': getattr(exc, 'status_code', 500),
+                           'retry_after': getattr(exc, 'retry_after', None)}, f, ensure_ascii=False)
+        except OSError as e:
+            logger.error(f"single-flight 오류 기록 실패: {e}")
+
+    def _maybe_prune(self):
+        now = time.time()
+        if now - self._last_prune < self.stale_after:
+            return
+        self._last_prune = now
+        try:
+            for entry in os.scandir(self.lock_dir):
+                if now - entry.stat().st_mtime > self.stale_after:
+                    os.unlink(entry.path)
+        except OSError:
+            pass
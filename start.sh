@@ -1,3 +1,15 @@
 #!/bin/bash
 
-sudo nohup venv/bin/gunicorn --bind 0:80 main:app &
\ No newline at end of file
+# SERVE_MODE=async ./start.sh 로 실행하면 gevent 워커 하나가 수백 개의 모델 호출을 동시에 기다릴 수 있다.
+# (gevent 패키지 필요: venv/bin/pip install gevent)
+# 설문조사 분석 API(/api/analytics)와 survey_analytics.py는 numpy가 필요하다: venv/bin/pip install numpy
+# sync 워커는 AI 응답을 기다리는 동안 다른 요청을 못 받으므로 여러 개 띄우고, AI 호출은 (워커 수 - 1)개까지만
+# 허용해 설문조사 요청을 받을 워커를 항상 하나 남긴다. 워커 수는 WEB_CONCURRENCY로 바꿀 수 있다.
+# 워커 타임아웃은 AI 요청의 마감 시간(main.py의 MODEL_REQUEST_DEADLINE, 60초)보다 길어야 한다. 더 짧으면
+# 게이트웨이가 504로 응답하기 전에 gunicorn이 워커를 죽여 연결이 그냥 끊긴다.
+if [ "$SERVE_MODE" = "async" ]; then
+    sudo nohup venv/bin/gunicorn --bind 0:80 --worker-class gevent --worker-connections 1000 main:app &
+else
+    WORKERS=${WEB_CONCURRENCY:-4}
+    sudo env WEB_CONCURRENCY=$WORKERS nohup venv/bin/gunicorn --bind 0:80 --workers $WORKERS --timeout 120 main:app &
+fi
@@ -14,16 +14,13 @@ $('#reload').on('click', function() {
 $('#submit').on('click', function(event) {
     event.preventDefault(); // 기본 폼 제출 방지
 
-    const urlParams = new URLSearchParams(window.location.search);
-    const pageParam = urlParams.get('page') || '00000000';
-    // 폼 데이터 수집
+    // 폼 데이터 수집 (slot, progress는 폼의 hidden 필드로 포함됨)
     let formData = $('#form').serializeArray();
     
     // 추가 데이터
     formData.push({ name: 'button_time', value: button_time-start_time });
     formData.push({ name: 'submit_time', value: Date.now()-button_time });
     formData.push({ name: 'id', value: document.title})
-    formData.push({ name: 'page', value: pageParam });
 
     // POST 요청 보내기
     $.ajax({
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""설문조사 제출 결과를 저장하는 추가 전용(append-only) SQLite 저장소
+
+SQLite WAL 모드를 사용하므로 여러 gunicorn 워커가 같은 파일에 동시에 기록해도 안전하다.
+각 워커의 백그라운드 기록 스레드가 대기 중인 제출을 모아 한 트랜잭션으로 커밋(group commit)하고,
+submit()은 해당 묶음이 커밋된 뒤에 반환된다.
+
+명령행 사용법:
+    python submission_store.py export results.csv
+    python submission_store.py export results.parquet --format parquet
+    python submission_store.py import-legacy post
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+
+from blocking_io import run_blocking
+from metrics import FILE_IO_SECONDS
+from passage_catalog import PassageCatalog
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = 'submissions.db'
+
+# 내보내기 시 답안보다 앞에 오는 기본 열
+BASE_FIELDS = ['ip', 'timestamp_utc', 'button_time', 'submit_time', 'id', 'slot']
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS submissions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp_utc TEXT NOT NULL,
+    ip TEXT,
+    slot INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS submissions_slot ON submissions (slot);
+CREATE TABLE IF NOT EXISTS legacy_imports (
+    filename TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+'''
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=FULL')
+    conn.execute('PRAGMA busy_timeout=30000')
+    return conn
+
+
+class _Pending:
+    """기록 스레드에 넘긴 제출 한 건과 커밋 완료 신호"""
+
+    __slots__ = ('record', 'done', 'error')
+
+    def __init__(self, record):
+        self.record = record
+        self.done = threading.Event()
+        self.error = None
+
+
+class SubmissionStore:
+    """설문조사 제출 결과 저장소"""
+
+    def __init__(self, path=DEFAULT_DB_PATH, batch_size=256, batch_wait=0.005, commit_timeout=10.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait  # 첫 제출 이후 같은 묶음에 합류를 기다리는 시간(초)
+        self.commit_timeout = commit_timeout
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_pid = None
+        self._start_lock = threading.Lock()
+        conn = _connect(path)
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    # --- 기록 ---
+
+    def _ensure_writer(self):
+        # gunicorn --preload 등으로 fork된 경우 부모의 스레드는 없으므로 워커에서 새로 시작한다.
+        if self._writer is not None and self._writer_pid == os.getpid() and self._writer.is_alive():
+            return
+        with self._start_lock:
+            if self._writer is not None and self._writer_pid == os.getpid() and self._writer.is_alive():
+                return
+            self._queue = queue.Queue()
+            self._writer_pid = os.getpid()
+            self._writer = threading.Thread(target=self._run_writer, name='submission-writer', daemon=True)
+            self._writer.start()
+
+    def _run_writer(self):
+        conn = _connect(self.path)
+        pending_queue = self._queue
+        while True:
+            first = pending_queue.get()
+            if first is None:
+                break
+            batch = [first]
+            stop = False
+            try:
+                while len(batch) < self.batch_size:
+                    item = pending_queue.get(timeout=self.batch_wait)
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+            except queue.Empty:
+                pass
+            run_blocking(self._commit, conn, batch)
+            if stop:
+                break
+        conn.close()
+
+    def _commit(self, conn, batch):
+        rows = [(p.record.get('timestamp_utc', ''), p.record.get('ip'), _int_or_none(p.record.get('slot')),
+                 json.dumps(p.record, ensure_ascii=False)) for p in batch]
+        try:
+            with FILE_IO_SECONDS.time('submission_commit', os.path.basename(self.path)), conn:
+                conn.executemany('INSERT INTO submissions (timestamp_utc, ip, slot, data) VALUES (?, ?, ?, ?)', rows)
+        except sqlite3.Error as e:
+            logger.error(f"설문조사 결과 {len(batch)}건 저장 중 오류 발생: {e}")
+            for p in batch:
+                p.error = e
+        for p in batch:
+            p.done.set()
+
+    def submit(self, record):
+        """제출 결과 한 건을 저장하고, 커밋될 때까지 기다린다 (실패 시 예외 발생)"""
+        self._ensure_writer()
+        pending = _Pending(record)
+        self._queue.put(pending)
+        if not pending.done.wait(self.commit_timeout):
+            raise TimeoutError('설문조사 결과 저장이 제한 시간 안에 완료되지 않았습니다.')
+        if pending.error is not None:
+            raise pending.error
+
+    def close(self):
+        """대기 중인 제출을 모두 커밋하고 기록 스레드를 종료"""
+        if self._writer is not None and self._writer_pid == os.getpid() and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(self.commit_timeout)
+
+    # --- 조회 ---
+
+    def counts_by_slot(self, after_seq=0):
+        """after_seq 이후에 저장된 제출의 슬롯별 개수와 마지막 seq 반환"""
+        return run_blocking(self._counts_by_slot, after_seq)
+
+    def _counts_by_slot(self, after_seq):
+        conn = _connect(self.path)
+        try:
+            with FILE_IO_SECONDS.time('submission_counts', os.path.basename(self.path)):
+                last_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM submissions').fetchone()[0]
+                rows = conn.execute('SELECT slot, COUNT(*) FROM submissions WHERE seq > ? AND seq <= ? '
+                                    'AND slot IS NOT NULL GROUP BY slot', (after_seq, last_seq)).fetchall()
+        finally:
+            conn.close()
+        return dict(rows), last_seq
+
+    def iter_records(self, after_seq=0):
+        """after_seq 이후의 (seq, 제출 결과 dict)를 저장 순서대로 반환"""
+        conn = _connect(self.path)
+        try:
+            for seq, data in conn.execute('SELECT seq, data FROM submissions WHERE seq > ? ORDER BY seq', (after_seq,)):
+                yield seq, json.loads(data)
+        finally:
+            conn.close()
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# ==============================================================================
+# 내보내기 / 가져오기
+# ==============================================================================
+
+def _export_columns(records):
+    answers = sorted({key for record in records for key in record if key not in BASE_FIELDS})
+    return BASE_FIELDS + answers
+
+
+def export_csv(store, out_path):
+    records = [record for _, record in store.iter_records()]
+    columns = _export_columns(records)
+    with open(out_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(records)
+    return len(records)
+
+
+def export_parquet(store, out_path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError('Parquet 내보내기에는 pyarrow 패키지가 필요합니다. (pip install pyarrow)')
+    records = [record for _, record in store.iter_records()]
+    columns = _export_columns(records)
+    table = pa.table({column: [None if record.get(column) is None else str(record[column]) for record in records]
+                      for column in columns})
+    pq.write_table(table, out_path)
+    return len(records)
+
+
+def import_legacy(store, folder, catalog):
+    """예전 방식(post/ 폴더에 제출당 JSON 파일 하나)으로 저장된 결과를 저장소로 옮긴다.
+
+    예전 파일에는 slot이 없으므로 지문 id로 카탈로그에서 슬롯을 찾아 넣는다. 가져온 파일 이름을
+    legacy_imports 테이블에 남기므로 여러 번 실행해도 중복되지 않는다. 이 기록이 생기기 전에 이미
+    가져온 파일(내용이 같은 행이 있는 파일)은 다시 넣지 않고 비어 있는 슬롯만 채운다.
+    (가져온 건수, 슬롯을 채운 건수)를 반환한다.
+    """
+    slot_by_id = {passage['id']: passage['_slot'] for passage in catalog.passages()}
+    conn = _connect(store.path)
+    try:
+        done = {row[0] for row in conn.execute('SELECT filename FROM legacy_imports')}
+        earlier = {}  # 파일 이름 기록 없이 저장된 행의 data -> seq 목록
+        for seq, data in conn.execute('SELECT seq, data FROM submissions '
+                                      'WHERE seq NOT IN (SELECT seq FROM legacy_imports) ORDER BY seq'):
+            earlier.setdefault(data, []).append(seq)
+
+        imported = backfilled = 0
+        with conn:
+            for filename in sorted(os.listdir(folder)):
+                if not filename.endswith('.json') or filename in done:
+                    continue
+                try:
+                    with open(os.path.join(folder, filename), 'r', encoding='UTF-8') as json_file:
+                        record = json.load(json_file)
+                except (IOError, json.JSONDecodeError) as e:
+                    logger.error(f"'{filename}' 가져오기 중 오류 발생: {e}")
+                    continue
+                slot = _int_or_none(record.get('slot'))
+                if slot is None:
+                    slot = slot_by_id.get(record.get('id'))
+                    if slot is None:
+                        logger.warning(f"'{filename}'의 지문 id({record.get('id')})에 해당하는 슬롯이 없습니다.")
+                data = json.dumps(record, ensure_ascii=False)
+                if earlier.get(data):
+                    seq = earlier[data].pop(0)
+                    conn.execute('UPDATE submissions SET slot = ? WHERE seq = ? AND slot IS NULL', (slot, seq))
+                    backfilled += 1
+                else:
+                    seq = conn.execute('INSERT INTO submissions (timestamp_utc, ip, slot, data) VALUES (?, ?, ?, ?)',
+                                       (record.get('timestamp_utc', ''), record.get('ip'), slot, data)).lastrowid
+                    imported += 1
+                conn.execute('INSERT INTO legacy_imports (filename, seq) VALUES (?, ?)', (filename, seq))
+    finally:
+        conn.close()
+    return imported, backfilled
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='설문조사 제출 결과 저장소 도구')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='SQLite 저장소 경로')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='제출 결과를 파일로 내보내기')
+    export_parser.add_argument('out', help='출력 파일 경로')
+    export_parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+
+    import_parser = subparsers.add_parser('import-legacy', help='post/ 폴더의 JSON 파일 가져오기')
+    import_parser.add_argument('folder', nargs='?', default='post')
+    import_parser.add_argument('--passages', default='json', help='지문 id를 슬롯으로 바꿀 때 쓰는 지문 폴더')
+    import_parser.add_argument('--slot-file', default='passage_slots.json', help='지문별 고정 슬롯 번호 파일')
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    store = SubmissionStore(args.db)
+    try:
+        if args.command == 'export':
+            exporter = export_parquet if args.format == 'parquet' else export_csv
+            count = exporter(store, args.out)
+            logger.info(f"{count}건을 '{args.out}'(으)로 내보냈습니다.")
+        else:
+            catalog = PassageCatalog(args.passages, slot_file=args.slot_file)
+            imported, backfilled = import_legacy(store, args.folder, catalog)
+            logger.info(f"'{args.folder}'에서 {imported}건을 가져오고, 이전에 가져온 {backfilled}건의 슬롯을 채웠습니다.")
+            if imported or backfilled:
+                logger.info("실행 중인 서버의 지문별 응답 수에는 서버를 다시 시작하면 반영됩니다.")
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
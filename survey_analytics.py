@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""설문조사 제출 결과 증분 분석
+
+제출 저장소(submissions.db)에서 마지막으로 읽은 seq 이후의 기록만 읽어 지문(id)별 집계에 더한다.
+집계는 numpy 배열로 유지한다. (저장 파일은 열 단위, 메모리에서는 지문별)
+- Q1(글의 주제) 선택지 1~5 / 모르겠어요(none) 분포
+- Q2~Q6 O / X / 모르겠어요(none) 응답 비율
+- button_time(글 읽는 시간), submit_time(문제 푸는 시간) 백분위수
+
+명령행 사용법:
+    python survey_analytics.py               # 새 제출만 반영하고 결과 JSON 출력
+    python survey_analytics.py --out stats.json
+    python survey_analytics.py --rebuild     # 체크포인트를 버리고 처음부터 다시 집계
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+
+import numpy as np
+
+from submission_store import DEFAULT_DB_PATH, SubmissionStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = 'survey_analytics.npz'
+
+Q1_CHOICES = ['1', '2', '3', '4', '5', 'none']
+OX_QUESTIONS = ['Q2', 'Q3', 'Q4', 'Q5', 'Q6']
+OX_ANSWERS = ['O', 'X', 'none']
+PERCENTILES = [50, 90, 95, 99]
+
+
+def _to_float(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return number if number >= 0 else math.nan
+
+
+class SurveyAnalytics:
+    """지문별 집계와 체크포인트
+
+    읽기/풀이 시간은 지문마다 따로 배열로 두고, 지문별 결과는 새 제출이 들어온 지문만 다시 계산한다.
+    따라서 refresh()와 summary()의 비용은 전체 제출 수가 아니라 새로 들어온 제출과 그 지문의 크기에 비례한다.
+    """
+
+    def __init__(self):
+        self.checkpoint_seq = 0
+        self.passage_ids = []  # 집계 행 번호 -> 지문 id
+        self._passage_index = {}
+        # 지문(행)마다 제출 한 건당 한 칸씩 늘어나는 배열
+        self.button_times = []
+        self.submit_times = []
+        # 지문당 한 행인 카운트 행렬
+        self.q1_counts = np.zeros((0, len(Q1_CHOICES)), dtype=np.int64)
+        self.ox_counts = np.zeros((0, len(OX_QUESTIONS), len(OX_ANSWERS)), dtype=np.int64)
+        self.total_responses = 0
+        self._passage_summaries = []  # 행 -> 마지막으로 계산한 지문별 결과
+        self._dirty_rows = set()  # 결과를 다시 계산해야 하는 행
+        self._summary = None  # 새 제출이 없으면 그대로 돌려주는 전체 결과
+
+    # --- 저장 / 불러오기 ---
+
+    @classmethod
+    def load(cls, path):
+        analytics = cls()
+        if not os.path.exists(path):
+            return analytics
+        with np.load(path, allow_pickle=False) as state:
+            if state['q1_counts'].shape[1:] != (len(Q1_CHOICES),):
+                # 선택지가 바뀌기 전의 상태는 빠진 응답을 채울 수 없으므로 처음부터 다시 집계한다.
+                logger.warning(f"분석 상태 '{path}'의 Q1 선택지가 현재와 달라 처음부터 다시 집계합니다.")
+                return analytics
+            analytics.checkpoint_seq = int(state['checkpoint_seq'])
+            for passage_id in state['passage_ids']:
+                analytics._passage_row(str(passage_id))
+            # 저장 파일은 열 단위(제출 한 건당 한 칸)이므로 불러올 때 한 번만 지문별로 나눈다.
+            row_passage = state['row_passage']
+            order = np.argsort(row_passage, kind='stable')
+            bounds = np.cumsum(np.bincount(row_passage, minlength=len(analytics.passage_ids)))[:-1]
+            analytics.button_times = np.split(state['button_time'][order], bounds)
+            analytics.submit_times = np.split(state['submit_time'][order], bounds)
+            analytics.q1_counts = state['q1_counts']
+            analytics.ox_counts = state['ox_counts']
+            analytics.total_responses = int(row_passage.size)
+        return analytics
+
+    def save(self, path):
+        # 여러 워커가 같은 파일에 저장할 수 있으므로 임시 파일 이름에 pid를 붙인다.
+        tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+        row_passage = np.concatenate([np.full(len(times), row, dtype=np.int32)
+                                      for row, times in enumerate(self.button_times)] or [np.zeros(0, np.int32)])
+        np.savez(tmp_path, checkpoint_seq=np.int64(self.checkpoint_seq),
+                 passage_ids=np.array(self.passage_ids, dtype=str), row_passage=row_passage,
+                 button_time=np.concatenate(self.button_times or [np.zeros(0)]),
+                 submit_time=np.concatenate(self.submit_times or [np.zeros(0)]),
+                 q1_counts=self.q1_counts, ox_counts=self.ox_counts)
+        os.replace(tmp_path, path)
+
+    # --- 증분 반영 ---
+
+    def _passage_row(self, passage_id):
+        index = self._passage_index.get(passage_id)
+        if index is None:
+            index = self._passage_index[passage_id] = len(self.passage_ids)
+            self.passage_ids.append(passage_id)
+            self.button_times.append(np.zeros(0, dtype=np.float64))
+            self.submit_times.append(np.zeros(0, dtype=np.float64))
+            self._passage_summaries.append(None)
+            self._dirty_rows.add(index)
+        return index
+
+    def ingest(self, records):
+        """(seq, 제출 dict) 목록을 집계에 더하고, 반영한 건수를 반환"""
+        rows, buttons, submits, q1_cells, ox_cells = [], [], [], [], []
+        for seq, record in records:
+            self.checkpoint_seq = max(self.checkpoint_seq, seq)
+            passage_id = record.get('id')
+            if not passage_id:
+                continue
+            row = self._passage_row(str(passage_id))
+            rows.append(row)
+            buttons.append(_to_float(record.get('button_time')))
+            submits.append(_to_float(record.get('submit_time')))
+            if record.get('Q1') in Q1_CHOICES:
+                q1_cells.append((row, Q1_CHOICES.index(record['Q1'])))
+            for q, question in enumerate(OX_QUESTIONS):
+                answer = record.get(question)
+                if answer in OX_ANSWERS:
+                    ox_cells.append((row, q, OX_ANSWERS.index(answer)))
+        self._summary = None
+        if not rows:
+            return 0
+
+        passage_count = len(self.passage_ids)
+        if passage_count > len(self.q1_counts):
+            grow = passage_count - len(self.q1_counts)
+            self.q1_counts = np.concatenate([self.q1_counts, np.zeros((grow,) + self.q1_counts.shape[1:], np.int64)])
+            self.ox_counts = np.concatenate([self.ox_counts, np.zeros((grow,) + self.ox_counts.shape[1:], np.int64)])
+
+        # 이번에 들어온 제출만 지문별로 나누어, 해당 지문의 배열에만 덧붙인다.
+        rows = np.array(rows, dtype=np.int32)
+        order = np.argsort(rows, kind='stable')
+        touched, starts = np.unique(rows[order], return_index=True)
+        buttons = np.split(np.array(buttons, dtype=np.float64)[order], starts[1:])
+        submits = np.split(np.array(submits, dtype=np.float64)[order], starts[1:])
+        for row, new_buttons, new_submits in zip(touched.tolist(), buttons, submits):
+            self.button_times[row] = np.concatenate([self.button_times[row], new_buttons])
+            self.submit_times[row] = np.concatenate([self.submit_times[row], new_submits])
+        if q1_cells:
+            np.add.at(self.q1_counts, tuple(np.array(q1_cells).T), 1)
+        if ox_cells:
+            np.add.at(self.ox_counts, tuple(np.array(ox_cells).T), 1)
+        self.total_responses += len(rows)
+        self._dirty_rows.update(touched.tolist())
+        return len(rows)
+
+    def refresh(self, store):
+        """저장소에서 체크포인트 이후의 제출만 읽어 반영"""
+        return self.ingest(store.iter_records(self.checkpoint_seq))
+
+    # --- 결과 ---
+
+    def _time_stats(self, values):
+        """한 지문의 백분위수 (결측(NaN)은 뺀다)"""
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return None
+        percentiles = np.percentile(values, PERCENTILES)
+        entry = {f'p{p}': round(float(v), 1) for p, v in zip(PERCENTILES, percentiles)}
+        entry['mean'] = round(float(values.mean()), 1)
+        entry['count'] = int(values.size)
+        return entry
+
+    def _passage_summary(self, row):
+        ox_totals = self.ox_counts[row].sum(axis=1)
+        answers = {}
+        for q, question in enumerate(OX_QUESTIONS):
+            if ox_totals[q]:
+                answers[question.lower()] = {answer: round(float(count / ox_totals[q]), 4)
+                                             for answer, count in zip(OX_ANSWERS, self.ox_counts[row, q])}
+                answers[question.lower()]['count'] = int(ox_totals[q])
+        return {
+            'responses': int(self.button_times[row].size),
+            'q1': {choice: int(count) for choice, count in zip(Q1_CHOICES, self.q1_counts[row])},
+            'answers': answers,
+            'button_time_ms': self._time_stats(self.button_times[row]),
+            'submit_time_ms': self._time_stats(self.submit_times[row]),
+        }
+
+    def summary(self):
+        """대시보드용 JSON 직렬화 가능한 dict (새 제출이 들어온 지문만 다시 계산)"""
+        if self._summary is None:
+            for row in self._dirty_rows:
+                self._passage_summaries[row] = self._passage_summary(row)
+            self._dirty_rows.clear()
+            self._summary = {
+                'checkpoint_seq': self.checkpoint_seq,
+                'total_responses': self.total_responses,
+                'passages': dict(zip(self.passage_ids, self._passage_summaries)),
+            }
+        return self._summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='설문조사 결과 증분 분석')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='제출 저장소 SQLite 경로')
+    parser.add_argument('--state', default=DEFAULT_STATE_PATH, help='집계/체크포인트 저장 파일')
+    parser.add_argument('--out', help='결과 JSON 파일 경로 (없으면 표준 출력)')
+    parser.add_argument('--rebuild', action='store_true', help='체크포인트를 무시하고 처음부터 다시 집계')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    analytics = SurveyAnalytics() if args.rebuild else SurveyAnalytics.load(args.state)
+    added = analytics.refresh(SubmissionStore(args.db))
+    analytics.save(args.state)
+    logger.info(f"새 제출 {added}건 반영 (체크포인트 seq {analytics.checkpoint_seq})")
+
+    output = json.dumps(analytics.summary(), ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='UTF-8') as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""설문 진행 상황 비트셋 인코딩과 응답 수가 적은 지문부터 배정하는 스케줄러"""
+import base64
+import bisect
+import random
+import threading
+
+
+# ==============================================================================
+# 진행 상황 토큰 (URL-safe 비트셋)
+# ==============================================================================
+
+def encode_progress(slots):
+    """완료한 슬롯 번호 집합을 URL에 넣을 수 있는 짧은 문자열로 변환"""
+    bits = 0
+    for slot in slots:
+        bits |= 1 << slot
+    if not bits:
+        return ''
+    raw = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_progress(token, max_slot=None):
+    """encode_progress로 만든 문자열을 슬롯 번호 집합으로 복원 (잘못된 값이면 ValueError)
+
+    max_slot을 주면 그보다 큰 슬롯을 담을 수 있는 길이의 토큰은 디코딩하기 전에 거절한다.
+    """
+    if not token:
+        return set()
+    if max_slot is not None:
+        max_bytes = max_slot // 8 + 1
+        if len(token) > (max_bytes * 4 + 2) // 3:
+            raise ValueError(f"진행 상황 토큰이 너무 깁니다: {len(token)}자")
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"잘못된 진행 상황 토큰: {token[:64]!r}") from e
+    # 바이트 단위로 읽어 토큰 길이에 비례하는 시간만 쓴다.
+    slots = set()
+    for index, byte in enumerate(raw):
+        while byte:
+            low = byte & -byte
+            slot = index * 8 + low.bit_length() - 1
+            if max_slot is not None and slot > max_slot:
+                raise ValueError(f"진행 상황 토큰에 존재하지 않는 슬롯이 있습니다: {slot}")
+            slots.add(slot)
+            byte ^= low
+    return slots
+
+
+# ==============================================================================
+# 최소 응답 우선 배정 스케줄러
+# ==============================================================================
+
+class LeastAnsweredScheduler:
+    """슬롯별 완료 응답 수를 버킷(응답 수 -> 슬롯 집합)으로 관리하고,
+    선택 가능한 지문 중 응답 수가 가장 적은 것을 고른다 (동률이면 무작위)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}  # 슬롯 -> 완료 응답 수
+        self._buckets = {}  # 응답 수 -> 슬롯 집합
+        self._levels = []  # 비어 있지 않은 버킷의 응답 수 (오름차순)
+
+    def _move(self, slot, old, new):
+        if old is not None:
+            bucket = self._buckets[old]
+            bucket.discard(slot)
+            if not bucket:
+                del self._buckets[old]
+                del self._levels[bisect.bisect_left(self._levels, old)]
+        if new not in self._buckets:
+            self._buckets[new] = set()
+            bisect.insort(self._levels, new)
+        self._buckets[new].add(slot)
+        self._counts[slot] = new
+
+    def sync(self, slots):
+        """카탈로그의 슬롯 목록을 반영 (새 슬롯은 0회로 추가, 사라진 슬롯은 제거)"""
+        slots = set(slots)
+        with self._lock:
+            for slot in list(self._counts):
+                if slot not in slots:
+                    count = self._counts.pop(slot)
+                    self._buckets[count].discard(slot)
+                    if not self._buckets[count]:
+                        del self._buckets[count]
+                        del self._levels[bisect.bisect_left(self._levels, count)]
+            for slot in slots:
+                if slot not in self._counts:
+                    self._move(slot, None, 0)
+
+    def record(self, slot, n=1):
+        """제출된 응답을 반영"""
+        with self._lock:
+            old = self._counts.get(slot)
+            self._move(slot, old, (old or 0) + n)
+
+    def count(self, slot):
+        return self._counts.get(slot, 0)
+
+    def choose(self, is_eligible):
+        """is_eligible(slot)이 참인 슬롯 중 응답 수가 가장 적은 슬롯 (없으면 None)"""
+        with self._lock:
+            for level in self._levels:
+                candidates = [slot for slot in self._buckets[level] if is_eligible(slot)]
+                if candidates:
+                    return random.choice(candidates)
+        return None